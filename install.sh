@@ -36,7 +36,16 @@ is_valid_env() {
 }
 
 detect_env() {
-    local os
+    local os env
+
+    # Prefer the python detection, it runs the probes concurrently with a time budget
+    if command -v python3 > /dev/null 2>&1 \
+        && env="$("${DOTFILES_DIR}/bin/dotfiles" osinfo --env 2>/dev/null)" \
+        && [ -n "$env" ]; then
+        echo "$env"
+        return
+    fi
+
     os="$(uname -s)"
 
     case "$os" in
@@ -1,7 +1,28 @@
 # -*- coding: utf-8 -*-
+import importlib
+from typing import TYPE_CHECKING
 
-from dotfiles import osinfo
-from dotfiles.utils import installed, is_cmd_installed, is_pkg_installed
+if TYPE_CHECKING:
+    from dotfiles import osinfo
+    from dotfiles.utils import installed, installed_many, is_cmd_installed, is_pkg_installed, which_many
+
+# The public helpers are imported on first access so that running a single
+# command doesn't pay for importing every module.
+_LAZY_ATTRIBUTES = {
+    'osinfo': 'dotfiles.osinfo',
+    'installed': 'dotfiles.utils',
+    'is_cmd_installed': 'dotfiles.utils',
+    'is_pkg_installed': 'dotfiles.utils',
+    'installed_many': 'dotfiles.utils',
+    'which_many': 'dotfiles.utils',
+}
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(_LAZY_ATTRIBUTES[name])
+    return module if module.__name__ == f"{__name__}.{name}" else getattr(module, name)
 
 
 __all__ = [
@@ -9,4 +30,6 @@ __all__ = [
     'installed',
     'is_cmd_installed',
     'is_pkg_installed',
+    'installed_many',
+    'which_many',
 ]
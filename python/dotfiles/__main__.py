@@ -1,3 +1,5 @@
+# Imported first so that the time spent importing the cli is traced
+from dotfiles import tracing  # pylint: disable=unused-import
 from dotfiles import main
 
 if __name__ == '__main__':
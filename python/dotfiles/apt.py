@@ -0,0 +1,328 @@
+import gzip
+import lzma
+import mmap
+import os
+import re
+import subprocess
+import time
+import zlib
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from dotfiles.paths import cache_path
+from dotfiles.utils import read_json_cache, write_json_cache
+
+LISTS_DIR = '/var/lib/apt/lists'
+# Touched by apt's post-update hook after every successful `apt update` (update-notifier-common)
+UPDATE_STAMP_PATH = '/var/lib/apt/periodic/update-success-stamp'
+# Only `apt update` downloads into it, so its mtime is when the lists were last fetched
+LISTS_PARTIAL_PATH = os.path.join(LISTS_DIR, 'partial')
+INDEX_VERSION = 1
+
+# e.g. "Package: php8.3" or "Package: php8.3-mbstring"
+_PHP_PACKAGE_PATTERN = re.compile(rb'^Package:[ \t]*php(\d+\.\d+)(?:-(\S+))?[ \t]*\r?$', re.MULTILINE)
+# e.g. "php8.3" or "php8.3-mbstring", as listed by `apt-cache pkgnames`
+_PHP_NAME_PATTERN = re.compile(r'^php(\d+\.\d+)(?:-(\S+))?$')
+
+# The package list files, as stored with and without `Acquire::GzipIndexes` (e.g. in Docker images)
+_LIST_SUFFIXES = ('_Packages', '_Packages.gz', '_Packages.xz', '_Packages.lz4')
+# The compressions python can read, the others are left to apt-cache
+_OPENERS = {'.gz': gzip.open, '.xz': lzma.open}
+
+
+def _get_list_files(lists_dir: str) -> List[str]:
+    """Get the package list files (compressed or not), sorted by name"""
+    try:
+        return sorted(
+            os.path.join(lists_dir, name) for name in os.listdir(lists_dir) if name.endswith(_LIST_SUFFIXES)
+        )
+    except OSError:
+        return []
+
+
+def _get_signatures(list_files: List[str]) -> List[list]:
+    """Get the [path, mtime, size] signature of each package list file"""
+    signatures = []
+    for path in list_files:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        signatures.append([path, stat.st_mtime_ns, stat.st_size])
+    return signatures
+
+
+def _add_php_package(packages: Dict[str, set], version: str, extension: Optional[str]) -> None:
+    """Add a php package to {version: extensions}"""
+    extensions = packages.setdefault(version, set())
+    if extension:
+        extensions.add(extension)
+
+
+def _scan_data(data: Union[bytes, mmap.mmap], packages: Dict[str, set]) -> None:
+    """Add the php packages of a package list's content to {version: extensions}"""
+    for match in _PHP_PACKAGE_PATTERN.finditer(data):
+        extension = match.group(2)
+        _add_php_package(packages, match.group(1).decode('ascii'), extension and extension.decode('utf-8', 'replace'))
+
+
+def _scan_php_packages(path: str, packages: Dict[str, set]) -> bool:
+    """Add the php versions and extensions of a package list file to {version: extensions}
+
+    Returns:
+        bool: False if the file is compressed in a format python can't read (lz4)
+    """
+    extension = os.path.splitext(path)[1]
+    if extension == '.lz4':
+        return False
+
+    try:
+        if extension in _OPENERS:
+            with _OPENERS[extension](path, 'rb') as file:
+                _scan_data(file.read(), packages)
+            return True
+
+        with open(path, 'rb') as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                return True
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                _scan_data(data, packages)
+    except (OSError, ValueError, EOFError, lzma.LZMAError):
+        pass
+    return True
+
+
+def _query_php_packages(packages: Dict[str, set]) -> None:
+    """Add the php versions and extensions known to apt-cache to {version: extensions}"""
+    try:
+        process = subprocess.run(
+            ['apt-cache', 'pkgnames', 'php'],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            check=False,
+        )
+    except OSError:
+        return
+
+    for line in process.stdout.decode('utf-8', 'replace').splitlines():
+        match = _PHP_NAME_PATTERN.match(line.strip())
+        if match:
+            _add_php_package(packages, match.group(1), match.group(2))
+
+
+def _get_index_path(lists_dir: str) -> str:
+    """Get the php package index path for a package lists directory"""
+    checksum = zlib.crc32(lists_dir.encode('utf-8'))
+    return cache_path(f"apt-php-{checksum:08x}.json")
+
+
+def _read_index(index_path: str, lists_dir: str, signatures: List[list]) -> Optional[Dict[str, List[str]]]:
+    """Read the php package index, returns None if it is missing or stale"""
+    index = read_json_cache(index_path)
+    if (
+        not isinstance(index, dict)
+        or index.get('version') != INDEX_VERSION
+        or index.get('lists_dir') != lists_dir
+        or index.get('lists') != signatures
+    ):
+        return None
+
+    return index.get('packages', {})
+
+
+def _write_index(index_path: str, lists_dir: str, signatures: List[list], packages: Dict[str, List[str]]) -> None:
+    """Write the php package index atomically. Failing to write the index is not an error."""
+    write_json_cache(index_path, {
+        'version': INDEX_VERSION,
+        'lists_dir': lists_dir,
+        'lists': signatures,
+        'packages': packages,
+    })
+
+
+def php_packages(lists_dir: str = LISTS_DIR, use_cache: bool = True) -> Dict[str, List[str]]:
+    """Get the php versions available from apt, and the extension packages of each.
+
+    Only the `Package:` lines of the package list files are looked at, plain
+    or gzip/xz compressed. When some of the lists can't be read (lz4), apt-cache
+    is asked instead. The result is cached, keyed on the list files' mtimes and
+    sizes, so it's only scanned again after an `apt update`.
+
+    Returns:
+        dict: {version: sorted extensions}, e.g. {'8.3': ['cli', 'common', …]}
+    """
+    lists_dir = os.path.abspath(lists_dir)
+    signatures = _get_signatures(_get_list_files(lists_dir))
+    index_path = _get_index_path(lists_dir)
+
+    if use_cache:
+        packages = _read_index(index_path, lists_dir, signatures)
+        if packages is not None:
+            return packages
+
+    found: Dict[str, set] = {}
+    readable = [_scan_php_packages(path, found) for path, _, _ in signatures]
+    if not all(readable):
+        _query_php_packages(found)
+
+    packages = {version: sorted(extensions) for version, extensions in found.items()}
+    if use_cache:
+        _write_index(index_path, lists_dir, signatures, packages)
+    return packages
+
+
+def lists_age(stamp_paths: Tuple[str, ...] = (UPDATE_STAMP_PATH, LISTS_PARTIAL_PATH)) -> Optional[float]:
+    """Get how many seconds ago the package lists were last updated, None if it can't be told
+
+    The list files themselves keep the mirror's Last-Modified time, so the age
+    comes from the first marker that exists and that only `apt update` writes:
+    the update success stamp, else the lists' download directory. (apt's
+    pkgcache.bin is no good, `apt install` rebuilds it too.) None means the
+    lists should be treated as stale.
+    """
+    for path in stamp_paths:
+        try:
+            return max(0.0, time.time() - os.stat(path).st_mtime)
+        except OSError:
+            continue
+    return None
+
+
+def _version_key(version: str) -> tuple:
+    return tuple(int(part) for part in version.split('.'))
+
+
+def available_php_versions(lists_dir: str = LISTS_DIR, use_cache: bool = True) -> List[str]:
+    """Get the php versions available from apt, newest first"""
+    return sorted(php_packages(lists_dir, use_cache), key=_version_key, reverse=True)
+
+
+class Source(NamedTuple):
+    """An apt repository configured in a sources file"""
+    path: str
+    types: Tuple[str, ...]
+    uris: Tuple[str, ...]
+    suites: Tuple[str, ...]
+    components: Tuple[str, ...]
+    signed_by: Optional[str]
+    enabled: bool
+
+
+def _parse_one_line_sources(path: str, content: str) -> Iterator[Source]:
+    """Parse a one-line style sources file, e.g. `deb [signed-by=…] uri suite component…`"""
+    for line in content.splitlines():
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+
+        options: Dict[str, str] = {}
+        match = re.match(r'^(\S+)\s+\[([^\]]*)\]\s*(.*)$', line)
+        if match:
+            kind, rest = match.group(1), match.group(3)
+            for option in match.group(2).split():
+                key, _, value = option.partition('=')
+                options[key.lower()] = value
+        else:
+            kind, _, rest = line.partition(' ')
+
+        parts = rest.split()
+        if kind not in ('deb', 'deb-src') or len(parts) < 2:
+            continue
+
+        yield Source(
+            path,
+            (kind,),
+            (parts[0],),
+            (parts[1],),
+            tuple(parts[2:]),
+            options.get('signed-by'),
+            options.get('enabled', 'yes').lower() != 'no',
+        )
+
+
+def _parse_deb822_stanza(path: str, fields: Dict[str, str]) -> Optional[Source]:
+    """Make a source out of a deb822 stanza, None if it isn't a repository"""
+    if 'types' not in fields or 'uris' not in fields:
+        return None
+
+    signed_by = fields.get('signed-by') or None
+    if signed_by is not None and '\n' in signed_by:
+        # The key itself is embedded in the file
+        signed_by = 'inline'
+
+    return Source(
+        path,
+        tuple(fields['types'].split()),
+        tuple(fields['uris'].split()),
+        tuple(fields.get('suites', '').split()),
+        tuple(fields.get('components', '').split()),
+        signed_by,
+        fields.get('enabled', 'yes').strip().lower() != 'no',
+    )
+
+
+def _parse_deb822_sources(path: str, content: str) -> Iterator[Source]:
+    """Parse a deb822 style (.sources) file, one repository per stanza"""
+    fields: Dict[str, str] = {}
+    key = None
+
+    for line in [*content.splitlines(), '']:
+        if line.startswith('#'):
+            continue
+        if not line.strip():
+            source = _parse_deb822_stanza(path, fields)
+            if source is not None:
+                yield source
+            fields, key = {}, None
+        elif line[0] in ' \t':
+            if key is not None:
+                fields[key] += '\n' + line.strip()
+        else:
+            key, _, value = line.partition(':')
+            key = key.strip().lower()
+            fields[key] = value.strip()
+
+
+def _read_text(path: str) -> str:
+    """Read a sources file, an empty string if it can't be read"""
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as file:
+            return file.read()
+    except OSError:
+        return ''
+
+
+def get_sources(root: str = os.sep) -> List[Source]:
+    """Get the apt repositories of sources.list and every sources.list.d file.
+
+    Args:
+        root (str): The root directory `etc/apt` is looked up in (default: /)
+    """
+    apt_dir = os.path.join(root, 'etc', 'apt')
+    parts_dir = os.path.join(apt_dir, 'sources.list.d')
+
+    try:
+        names = sorted(os.listdir(parts_dir))
+    except OSError:
+        names = []
+
+    sources = list(_parse_one_line_sources(
+        os.path.join(apt_dir, 'sources.list'),
+        _read_text(os.path.join(apt_dir, 'sources.list')),
+    ))
+    for name in names:
+        path = os.path.join(parts_dir, name)
+        if name.endswith('.list'):
+            sources.extend(_parse_one_line_sources(path, _read_text(path)))
+        elif name.endswith('.sources'):
+            sources.extend(_parse_deb822_sources(path, _read_text(path)))
+
+    return sources
+
+
+def has_source(uri_pattern: str, root: str = os.sep) -> bool:
+    """Check if an enabled apt repository has a URI matching a regular expression"""
+    regex = re.compile(uri_pattern, re.IGNORECASE)
+    return any(
+        source.enabled and any(regex.search(uri) for uri in source.uris)
+        for source in get_sources(root)
+    )
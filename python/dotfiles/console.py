@@ -1,9 +1,10 @@
 import io
 import os
+import re
 import sys
-from typing import Any, Dict, List, Tuple, Union, Literal, Iterable
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union, Literal, Iterable
 
-from dotfiles.errors import EmptyAnswerError, InvalidAnswerError
+from dotfiles.errors import EmptyAnswerError, InvalidAnswerError, MissingAnswerError
 from dotfiles.utils import array_unique, array_wrap
 
 AttributeType = Literal[
@@ -91,6 +92,19 @@ HIGHLIGHTS: dict[ColorType, int] = {
 RESET = "\033[0m"
 
 
+class _Preseed:
+    """Answers given up front, consulted before prompting"""
+
+    def __init__(self):
+        # {question key: answer}
+        self.answers: Dict[str, str] = {}
+        # Answer yes to every confirmation, and the default to every choice
+        self.assume_yes = False
+
+
+_preseed = _Preseed()
+
+
 def _can_do_color(
     no_color: Union[bool, None] = None,
     force_color: Union[bool, None] = None
@@ -194,9 +208,64 @@ def error(*args, **kwargs) -> None:
     print(*args, **kwargs)
 
 
-def confirm(question: str, tries: int = 2) -> bool:
-    """Ask a yes/no question via input() and return their answer."""
+def preseed(answers: Optional[Dict[str, str]] = None, assume_yes: bool = False) -> None:
+    """Answer questions up front, so that confirm() and choice() don't prompt for them
+
+    Args:
+        answers (dict): {question key: answer}
+        assume_yes (bool): Answer yes to every confirmation, and the default to every choice
+    """
+    _preseed.answers = dict(answers or {})
+    _preseed.assume_yes = assume_yes
+
+
+def has_answer(key: str) -> bool:
+    """Check if a question was answered up front (--yes doesn't count)"""
+    return key in _preseed.answers
+
+
+def read_answers_file(path: str) -> Dict[str, str]:
+    """Read an answers file, one `key=value` per line (blank lines and # comments are ignored)"""
+    answers = {}
+    with open(path, 'r', encoding='utf-8') as file:
+        for number, line in enumerate(file, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            key, sep, value = line.partition('=')
+            if not sep or not key.strip():
+                raise InvalidAnswerError(f'{path}:{number}: expected key=value')
+            answers[key.strip()] = value.strip()
+    return answers
+
+
+def _get_key(question: str, key: Optional[str]) -> str:
+    """Get a question's key, derived from the question when it has none"""
+    return key or re.sub(r'[^a-z0-9]+', '-', question.lower()).strip('-')
+
+
+def _require_terminal(key: str, question: str) -> None:
+    """Fail instead of waiting on input() when there is nobody to answer"""
+    if not sys.stdin or not sys.stdin.isatty():
+        raise MissingAnswerError(key, question)
+
+
+def confirm(question: str, tries: int = 2, key: Optional[str] = None) -> bool:
+    """Ask a yes/no question via input() and return their answer.
+
+    A preseeded answer (or --yes) is used instead of asking.
+    """
     valid = {"yes": True, "ye": True, "y": True, "no": False, "n": False}
+    key = _get_key(question, key)
+
+    if key in _preseed.answers:
+        answer = _preseed.answers[key].strip().lower()
+        if answer not in valid:
+            raise InvalidAnswerError(f'Value "{answer}" is invalid for {key}!')
+        return valid[answer]
+    if _preseed.assume_yes:
+        return True
+    _require_terminal(key, question)
 
     while tries > 0:
         print(f"{question} (yes/no) [no]:")
@@ -215,15 +284,22 @@ def choice(
     choices: Union[Dict[str, Any], Tuple[Any, ...], List[Any]],
     default=None,
     attempts: int = 2,
-    multiple: bool = False
+    multiple: bool = False,
+    *,
+    key: Optional[str] = None,
 ) -> Union[Any, Tuple[Any, ...], None]:
-    """Ask a choice question via input() and return their answer."""
+    """Ask a choice question via input() and return their answer.
+
+    A preseeded answer (a choice's key/index or value) is used instead of
+    asking. With --yes, the default is used.
+    """
     choices_is_dict = isinstance(choices, dict)
     if not choices_is_dict and default is not None and not isinstance(default, int):
         try:
             default = choices.index(default)
         except ValueError:
             default = None
+    key = _get_key(question, key)
 
     def is_choice(key: Union[str, int]) -> bool:
         if key is None:
@@ -285,6 +361,23 @@ def choice(
 
             raise InvalidAnswerError('Value is invalid!') from exc
 
+    def get_preseeded(answer: str) -> Iterator[Any]:
+        for value in [a.strip() for a in answer.split(',') if a.strip()] if multiple else [answer.strip()]:
+            items = choices.items() if choices_is_dict else enumerate(choices)
+            for choice_key, choice_value in items:
+                if value in (str(choice_key), str(choice_value)):
+                    yield choice_value
+                    break
+            else:
+                raise InvalidAnswerError(f'Value "{value}" is invalid for {key}!')
+
+    if key in _preseed.answers:
+        selected = tuple(get_preseeded(_preseed.answers[key]))
+        return array_unique(selected) if multiple else selected[0]
+    if _preseed.assume_yes and is_choice(default):
+        return (choices[default],) if multiple else choices[default]
+    _require_terminal(key, question)
+
     while attempts > 0:
         try:
             answer = ask()
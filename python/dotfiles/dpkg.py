@@ -0,0 +1,147 @@
+import os
+import re
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+STATUS_PATH = '/var/lib/dpkg/status'
+
+# The only fields the database keeps, everything else is skipped while parsing
+_FIELDS = ('package', 'status', 'version', 'architecture')
+
+
+class Package(NamedTuple):
+    """A package entry of the dpkg status file"""
+    name: str
+    version: str
+    architecture: str
+    # The "want flag state" triplet, e.g. "install ok installed"
+    status: str
+
+    @property
+    def state(self) -> str:
+        """The package's state (installed, config-files, not-installed, …)"""
+        return self.status.rsplit(' ', 1)[-1]
+
+    @property
+    def installed(self) -> bool:
+        """Whether the package is installed (not just its config files, or half-installed)"""
+        return self.state == 'installed'
+
+
+def _to_package(fields: Dict[str, str]) -> Package:
+    """Make a package out of a stanza's fields"""
+    return Package(
+        fields['package'],
+        fields.get('version', ''),
+        fields.get('architecture', ''),
+        fields.get('status', ''),
+    )
+
+
+def _parse(lines: Iterable[str]) -> Iterator[Package]:
+    """Parse the stanzas of a dpkg status file one line at a time"""
+    fields: Dict[str, str] = {}
+
+    for line in lines:
+        if line in ('\n', ''):
+            if 'package' in fields:
+                yield _to_package(fields)
+            fields = {}
+            continue
+        if line[0] in ' \t':
+            # Continuation of a multi-line field (description, conffiles, …)
+            continue
+        key, _, value = line.partition(':')
+        key = key.lower()
+        if key in _FIELDS:
+            fields[key] = value.strip()
+
+    if 'package' in fields:
+        yield _to_package(fields)
+
+
+class StatusDatabase:
+    """The packages of a dpkg status file, indexed by name"""
+
+    def __init__(self, packages: Iterable[Package]):
+        self._packages: Dict[str, Package] = {}
+        for package in packages:
+            # Multi-arch packages have one entry per architecture, keep the installed one
+            current = self._packages.get(package.name)
+            if current is None or (package.installed and not current.installed):
+                self._packages[package.name] = package
+        self._names: List[str] = sorted(self._packages)
+
+    def __len__(self) -> int:
+        return len(self._packages)
+
+    def __iter__(self) -> Iterator[Package]:
+        return iter(self._packages[name] for name in self._names)
+
+    def get(self, name: str) -> Optional[Package]:
+        """Get a package by name, None if dpkg doesn't know it"""
+        return self._packages.get(name.lower())
+
+    def is_installed(self, name: str) -> bool:
+        """Check if a package is installed"""
+        package = self.get(name)
+        return package is not None and package.installed
+
+    def installed_many(self, names: Iterable[str]) -> Dict[str, bool]:
+        """Check if each of the packages is installed"""
+        return {name: self.is_installed(name) for name in names}
+
+    def with_prefix(self, prefix: str) -> List[Package]:
+        """Get the packages whose name starts with a prefix, sorted by name"""
+        prefix = prefix.lower()
+        packages = []
+        for index in range(bisect_left(self._names, prefix), len(self._names)):
+            if not self._names[index].startswith(prefix):
+                break
+            packages.append(self._packages[self._names[index]])
+        return packages
+
+    def matching(self, pattern: str) -> List[Package]:
+        """Get the packages whose name matches a regular expression, sorted by name"""
+        regex = re.compile(pattern)
+        return [self._packages[name] for name in self._names if regex.search(name)]
+
+
+# {path: ((mtime_ns, size), database)}
+_databases: Dict[str, Tuple[Tuple[int, int], StatusDatabase]] = {}
+
+
+def load(path: str = STATUS_PATH) -> StatusDatabase:
+    """Load a dpkg status file.
+
+    The file is parsed once per process and parsed again only when its mtime
+    or size changes. A missing file is an empty database (e.g. on macOS).
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return StatusDatabase(())
+
+    signature = (stat.st_mtime_ns, stat.st_size)
+    cached = _databases.get(path)
+    if cached is not None and cached[0] == signature:
+        return cached[1]
+
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as file:
+            database = StatusDatabase(_parse(file))
+    except OSError:
+        return StatusDatabase(())
+
+    _databases[path] = (signature, database)
+    return database
+
+
+def is_installed(name: str, path: str = STATUS_PATH) -> bool:
+    """Check if a package is installed"""
+    return load(path).is_installed(name)
+
+
+def installed_many(names: Iterable[str], path: str = STATUS_PATH) -> Dict[str, bool]:
+    """Check if each of the packages is installed, reading the status file once"""
+    return load(path).installed_many(names)
@@ -6,6 +6,14 @@ class InvalidAnswerError(ValueError):
     pass
 
 
+class MissingAnswerError(ValueError):
+    """A question has no preseeded answer and there's no terminal to ask it on"""
+    def __init__(self, key: str, question: str):
+        super().__init__(f'No answer for "{question}", use --answer {key}=VALUE (or --yes)')
+        self.key = key
+        self.question = question
+
+
 class ValidationError(ValueError):
     """Represents a validation error"""
     def __init__(self, command: str, message: str):
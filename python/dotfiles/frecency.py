@@ -0,0 +1,166 @@
+import json
+import os
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from dotfiles.utils import read_json_cache
+
+# A log record is the access time and the key's length, followed by the utf-8 encoded key
+_RECORD_HEADER = struct.Struct('<IH')
+_SCORES_VERSION = 1
+# Fold the log into the scores file once it grows past this many bytes
+_COMPACT_SIZE = 16 * 1024
+# Age the scores once their ranks add up to more than this
+_MAX_TOTAL_RANK = 10000.0
+
+# {key: [rank, last access time]}
+Scores = Dict[str, List[float]]
+
+
+def _lock(file, exclusive: bool = True) -> None:
+    """Lock a file (no-op where fcntl isn't available)"""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _unlock(file) -> None:
+    """Unlock a file (no-op where fcntl isn't available)"""
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+
+
+def _parse_log(data: bytes) -> Iterator[Tuple[int, str]]:
+    """Parse the (time, key) records of a usage log, ignoring a torn last record"""
+    offset = 0
+    while offset + _RECORD_HEADER.size <= len(data):
+        timestamp, length = _RECORD_HEADER.unpack_from(data, offset)
+        offset += _RECORD_HEADER.size
+        if offset + length > len(data):
+            return
+        yield timestamp, data[offset:offset + length].decode('utf-8', 'replace')
+        offset += length
+
+
+def _read_log(log_path: str) -> bytes:
+    """Read the usage log"""
+    try:
+        with open(log_path, 'rb') as file:
+            return file.read()
+    except OSError:
+        return b''
+
+
+def _read_scores(scores_path: str) -> Scores:
+    """Read the compacted scores"""
+    data = read_json_cache(scores_path)
+    if not isinstance(data, dict) or data.get('version') != _SCORES_VERSION:
+        return {}
+
+    return data.get('scores', {})
+
+
+def _write_scores(scores_path: str, scores: Scores) -> None:
+    """Write the compacted scores atomically"""
+    tmp_path = f"{scores_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as file:
+        json.dump({'version': _SCORES_VERSION, 'scores': scores}, file, separators=(',', ':'))
+    os.replace(tmp_path, scores_path)
+
+
+def _apply(scores: Scores, records: Iterator[Tuple[int, str]]) -> Scores:
+    """Add log records to the scores"""
+    for timestamp, key in records:
+        entry = scores.setdefault(key, [0.0, 0])
+        entry[0] += 1
+        entry[1] = max(entry[1], timestamp)
+    return scores
+
+
+def _age(scores: Scores) -> Scores:
+    """Scale the ranks down once they get too big, forgetting the ones that get too small"""
+    total = sum(rank for rank, _ in scores.values())
+    if total <= _MAX_TOTAL_RANK:
+        return scores
+
+    factor = 0.9 * _MAX_TOTAL_RANK / total
+    return {key: [rank * factor, last] for key, (rank, last) in scores.items() if rank * factor >= 1}
+
+
+def load(path: str) -> Scores:
+    """Load the scores of a usage log.
+
+    Only the records appended since the last compaction are replayed, so this
+    costs the same no matter how many times keys have been used.
+
+    Args:
+        path (str): The usage log path without an extension
+    """
+    scores = _read_scores(f"{path}.json")
+    return _apply(scores, _parse_log(_read_log(f"{path}.log")))
+
+
+def compact(path: str) -> None:
+    """Fold the usage log into the scores file and age the scores.
+
+    Args:
+        path (str): The usage log path without an extension
+    """
+    with open(f"{path}.log", 'r+b') as file:
+        _lock(file)
+        try:
+            scores = _apply(_read_scores(f"{path}.json"), _parse_log(file.read()))
+            _write_scores(f"{path}.json", _age(scores))
+            file.truncate(0)
+        finally:
+            _unlock(file)
+
+
+def record(path: str, key: str, now: Optional[int] = None) -> None:
+    """Append a use of a key to the usage log, compacting the log when it gets too big.
+
+    Args:
+        path (str): The usage log path without an extension
+        key (str): The key that was used
+        now (int): The time it was used (default: now)
+    """
+    encoded = key.encode('utf-8')
+    if len(encoded) > 0xFFFF:
+        return
+
+    timestamp = int(time.time() if now is None else now)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    with open(f"{path}.log", 'ab') as file:
+        _lock(file)
+        try:
+            file.write(_RECORD_HEADER.pack(timestamp, len(encoded)) + encoded)
+            file.flush()
+            size = file.tell()
+        finally:
+            _unlock(file)
+
+    if size >= _COMPACT_SIZE:
+        compact(path)
+
+
+def frecency(scores: Scores, key: str, now: Optional[float] = None) -> float:
+    """Get a key's score, weighting how often it was used by how recently"""
+    if key not in scores:
+        return 0.0
+
+    rank, last = scores[key]
+    age = (time.time() if now is None else now) - last
+
+    if age < 3600:
+        return rank * 4
+    if age < 86400:
+        return rank * 2
+    if age < 604800:
+        return rank / 2
+    return rank / 4
@@ -0,0 +1,165 @@
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+# How many symbolic refs to follow before giving up (e.g. a ref loop)
+_MAX_SYMREF_DEPTH = 5
+_SECTION_PATTERN = re.compile(r'^\s*\[\s*([^\s"\]]+)(?:\s+"((?:[^"\\]|\\.)*)")?\s*\]')
+
+
+def _read_file(path: str) -> Optional[str]:
+    """Read a small text file, None if it can't be read"""
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return file.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
+
+def find_git_dir(path: str) -> Optional[str]:
+    """Get the git directory of a repo or worktree.
+
+    Worktrees and submodules have a `.git` file pointing to their git directory.
+    """
+    dot_git = os.path.join(path, '.git')
+
+    if os.path.isdir(dot_git):
+        return dot_git
+
+    content = _read_file(dot_git)
+    if content is None or not content.startswith('gitdir:'):
+        return None
+
+    git_dir = content[len('gitdir:'):].strip()
+    return os.path.normpath(os.path.join(path, git_dir))
+
+
+def get_common_dir(git_dir: str) -> str:
+    """Get the directory shared by all worktrees of a repo (refs, packed-refs, config)"""
+    common_dir = _read_file(os.path.join(git_dir, 'commondir'))
+    if common_dir is None:
+        return git_dir
+    return os.path.normpath(os.path.join(git_dir, common_dir.strip()))
+
+
+def _read_packed_refs(common_dir: str) -> Dict[str, str]:
+    """Read the packed refs of a repo"""
+    refs = {}
+    content = _read_file(os.path.join(common_dir, 'packed-refs')) or ''
+
+    for line in content.splitlines():
+        if not line or line.startswith(('#', '^')):
+            continue
+        sha, _, ref = line.partition(' ')
+        refs[ref.strip()] = sha
+
+    return refs
+
+
+def resolve_ref(git_dir: str, ref: str) -> Optional[str]:
+    """Resolve a ref to a commit sha, following symbolic refs.
+
+    Loose refs are looked up in the worktree's git directory first, then in
+    the common directory, then in packed-refs.
+    """
+    common_dir = get_common_dir(git_dir)
+    packed_refs = None
+
+    for _ in range(_MAX_SYMREF_DEPTH):
+        content = _read_file(os.path.join(git_dir, ref))
+        if content is None and common_dir != git_dir:
+            content = _read_file(os.path.join(common_dir, ref))
+
+        if content is None:
+            if packed_refs is None:
+                packed_refs = _read_packed_refs(common_dir)
+            return packed_refs.get(ref)
+
+        content = content.strip()
+        if not content.startswith('ref:'):
+            return content or None
+        ref = content[len('ref:'):].strip()
+
+    return None
+
+
+def read_head(git_dir: str) -> Tuple[Optional[str], Optional[str]]:
+    """Read HEAD.
+
+    Returns:
+        tuple: The branch name (None when detached) and the commit sha (None for an unborn branch)
+    """
+    content = (_read_file(os.path.join(git_dir, 'HEAD')) or '').strip()
+
+    if content.startswith('ref:'):
+        ref = content[len('ref:'):].strip()
+        branch = ref[len('refs/heads/'):] if ref.startswith('refs/heads/') else ref
+        return branch, resolve_ref(git_dir, ref)
+
+    return None, content or None
+
+
+def _read_config(common_dir: str) -> Dict[Tuple[str, str], Dict[str, str]]:
+    """Read a repo's config into {(section, subsection): {key: value}}.
+
+    Only what's needed to find upstreams is supported: no includes and no
+    multi-valued keys.
+    """
+    config: Dict[Tuple[str, str], Dict[str, str]] = {}
+    section = None
+    content = _read_file(os.path.join(common_dir, 'config')) or ''
+
+    for line in content.splitlines():
+        match = _SECTION_PATTERN.match(line)
+        if match:
+            name, subsection = match.group(1).lower(), match.group(2)
+            if subsection is None and '.' in name:
+                # Deprecated [section.subsection] syntax
+                name, subsection = name.split('.', 1)
+            section = config.setdefault((name, subsection or ''), {})
+            continue
+
+        line = line.split('#', 1)[0].split(';', 1)[0].strip()
+        if section is None or '=' not in line:
+            continue
+        key, value = line.split('=', 1)
+        section[key.strip().lower()] = value.strip().strip('"')
+
+    return config
+
+
+def read_upstream(git_dir: str, branch: Optional[str]) -> Optional[str]:
+    """Get the upstream of a branch (e.g. `origin/main`), None if it has none"""
+    if not branch:
+        return None
+
+    config = _read_config(get_common_dir(git_dir)).get(('branch', branch), {})
+    remote, merge = config.get('remote'), config.get('merge')
+    if not remote or not merge:
+        return None
+
+    merge = merge[len('refs/heads/'):] if merge.startswith('refs/heads/') else merge
+    return merge if remote == '.' else f"{remote}/{merge}"
+
+
+def read_remote_url(git_dir: str, remote: str = 'origin') -> Optional[str]:
+    """Get the url of a remote, None if it has none"""
+    return _read_config(get_common_dir(git_dir)).get(('remote', remote), {}).get('url') or None
+
+
+def get_info(path: str) -> Optional[dict]:
+    """Get a repo's current branch, HEAD sha and upstream without running git.
+
+    Returns:
+        dict|None: The repo info, None if the path isn't a git repo
+    """
+    git_dir = find_git_dir(path)
+    if git_dir is None or not os.path.isfile(os.path.join(git_dir, 'HEAD')):
+        return None
+
+    branch, head = read_head(git_dir)
+    return {
+        'branch': branch,
+        'head': head,
+        'upstream': read_upstream(git_dir, branch),
+    }
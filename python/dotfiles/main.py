@@ -1,13 +1,43 @@
 import argparse
+import importlib
 import sys
-from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter, PARSER
+import time
+from argparse import ArgumentParser, Namespace, RawDescriptionHelpFormatter, PARSER, _SubParsersAction
+from typing import List, NamedTuple, Optional, Tuple
 
-from dotfiles import console
-from dotfiles.errors import ValidationError
-from dotfiles.osinfo import add_parser as _add_osinfo_parser
-from dotfiles.php import add_install_parser as _add_php_install_parser
-from dotfiles.php import add_uninstall_parser as _add_php_uninstall_parser
-from dotfiles.repos import cmd_repos_completion as _cmd_repos_completion, add_parser as _add_repos_parser
+from dotfiles import console, tracing
+from dotfiles.errors import InvalidAnswerError, MissingAnswerError, ValidationError
+
+
+class _Command(NamedTuple):
+    """A subcommand whose module is only imported when the subcommand is selected"""
+    path: Tuple[str, ...]
+    module: str
+    add_parser: str
+    help: str
+
+
+class _Group(NamedTuple):
+    """A command that only groups subcommands (e.g. `dotfiles install`)"""
+    name: str
+    description: str
+    help: str
+
+
+_GROUPS: Tuple[_Group, ...] = (
+    _Group('install', 'Install something', 'install somthing'),
+    _Group('uninstall', 'Uninstall something', 'uninstall somthing'),
+)
+
+_COMMANDS: Tuple[_Command, ...] = (
+    _Command(('osinfo',), 'dotfiles.osinfo', 'add_parser', 'display basic info about your OS'),
+    _Command(('repos',), 'dotfiles.repos', 'add_parser', 'repo aliases'),
+    _Command(('repos-status',), 'dotfiles.repos_status', 'add_parser', 'show the git status of every repo'),
+    _Command(('repos-sync',), 'dotfiles.repos_sync', 'add_parser', 'fetch every repo'),
+    _Command(('serve',), 'dotfiles.serve', 'add_parser', 'run the completion/lookup server'),
+    _Command(('install', 'php'), 'dotfiles.php', 'add_install_parser', 'install php'),
+    _Command(('uninstall', 'php'), 'dotfiles.php', 'add_uninstall_parser', 'uninstall php'),
+)
 
 
 class _HelpFormatter(RawDescriptionHelpFormatter):
@@ -21,12 +51,127 @@ class _HelpFormatter(RawDescriptionHelpFormatter):
         return parts
 
 
-def _build_parser() -> ArgumentParser:
-    """Build the argument parser"""
+def _build_answers_parser(subcommand: bool) -> ArgumentParser:
+    """Build the parent parser of the -y/--yes, --answer and --answers-file options
+
+    They are accepted both before and after the command name (e.g. `dotfiles install php -y`).
+
+    Args:
+        subcommand (bool): Build the commands' copy. Its options have no defaults,
+                           so they don't reset what was given before the command,
+                           and its answers go to `command_answer`: argparse would
+                           replace the earlier `answer` list rather than extend it.
+    """
+    parser = ArgumentParser(add_help=False)
+    parser.add_argument(
+        '-y',
+        '--yes',
+        action='store_true',
+        default=argparse.SUPPRESS if subcommand else False,
+        help='answer yes to every confirmation and the default to every choice',
+    )
+    parser.add_argument(
+        '--answer',
+        action='append',
+        dest='command_answer' if subcommand else 'answer',
+        default=argparse.SUPPRESS if subcommand else [],
+        metavar='KEY=VALUE',
+        help='answer a question up front (e.g. install_php.version=8.3), can be repeated',
+    )
+    parser.add_argument(
+        '--answers-file',
+        type=str,
+        default=argparse.SUPPRESS if subcommand else None,
+        metavar='FILE',
+        help='read answers from a file of KEY=VALUE lines',
+    )
+    return parser
+
+
+class _CommandParsersAction(_SubParsersAction):
+    """Subparsers whose commands also accept the answer options, and no abbreviated options"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._answers_parser = _build_answers_parser(subcommand=True)
+
+    def add_parser(self, name, **kwargs):
+        kwargs.setdefault('parents', [self._answers_parser])
+        kwargs.setdefault('allow_abbrev', False)
+        return super().add_parser(name, **kwargs)
+
+
+def _get_selected_path(parser: ArgumentParser, argv: List[str]) -> Tuple[str, ...]:
+    """Get the command names selected by the arguments (e.g. ('install', 'php'))
+
+    The values of the top-level parser's options are skipped, going by which of
+    its options take a value. Only a group (e.g. `install`) is followed by
+    another command name, the arguments after a command are its own.
+    """
+    # noinspection PyProtectedMember
+    value_options = {
+        option
+        for action in parser._actions  # pylint: disable=protected-access
+        if action.nargs != 0
+        for option in action.option_strings
+    }
+    groups = {group.name for group in _GROUPS}
+    path: List[str] = []
+    args = iter(argv)
+
+    for arg in args:
+        if arg == '--':
+            break
+        if arg in value_options:
+            next(args, None)
+        elif not arg.startswith('-'):
+            path.append(arg)
+            if path[0] not in groups or len(path) == 2:
+                break
+
+    return tuple(path)
+
+
+def _add_commands(
+    subparsers: _SubParsersAction,
+    parent: Tuple[str, ...],
+    selected: Optional[Tuple[str, ...]],
+) -> None:
+    """Register the subcommands of a parent command.
+
+    Only the selected subcommand's module is imported and its full parser built,
+    the others are registered as stubs so they still show up in the help text.
+    When nothing is being selected (selected is None) every module is loaded.
+    """
+    depth = len(parent)
+    for command in _COMMANDS:
+        if command.path[:depth] != parent or len(command.path) != depth + 1:
+            continue
+
+        name = command.path[-1]
+        if selected is None or selected[depth:depth + 1] == (name,):
+            module = importlib.import_module(command.module)
+            getattr(module, command.add_parser)(subparsers)
+        else:
+            subparsers.add_parser(name, help=command.help)
+
+
+def _build_parser(argv: Optional[List[str]] = None) -> ArgumentParser:
+    """Build the argument parser
+
+    Args:
+        argv (list): The arguments that will be parsed. Only the modules of the
+                     commands they select are imported. If omitted, the parser
+                     is built for every command.
+    """
+    # No abbreviated options (e.g. `--answers` for `--answers-file`): the command
+    # _get_selected_path() and tracing.configure() only know the full names
     parser = ArgumentParser(
         prog='dotfiles',
         description='Helper commands',
         formatter_class=_HelpFormatter,
+        parents=[_build_answers_parser(subcommand=False)],
+        allow_abbrev=False,
     )
     parser.add_argument(
         '--completion',
@@ -34,46 +179,46 @@ def _build_parser() -> ArgumentParser:
         default=False,
         help=argparse.SUPPRESS,
     )
-    subparsers = parser.add_subparsers(
-        title='commands',
-        dest='command',
+    # Handled by tracing.configure() before parsing, so that building the parser is traced too
+    parser.add_argument(
+        '--profile',
+        action='store_true',
+        default=False,
+        help=f'write a Chrome trace of the run and print the slowest steps, same as ${tracing.ENV_VAR}',
     )
-
-    # Command: `dotfiles osinfo`
-    _add_osinfo_parser(subparsers)
-
-    # Command: `dotfiles repos`
-    _add_repos_parser(subparsers)
-
-    # Command: `dotfiles install`
-    install_parser = subparsers.add_parser(
-        'install',
-        description='Install something',
-        help='install somthing',
-        formatter_class=_HelpFormatter,
+    parser.add_argument(
+        '--profile-output',
+        type=str,
+        default=None,
+        metavar='FILE',
+        help=f'the trace file of --profile (implies --profile, default: {tracing.default_path()})',
     )
-    install_subparsers = install_parser.add_subparsers(
+    selected = None if argv is None else _get_selected_path(parser, argv)
+    subparsers = parser.add_subparsers(
         title='commands',
-        dest='subcommand',
+        dest='command',
+        action=_CommandParsersAction,
     )
 
-    # Command: `dotfiles install php`
-    _add_php_install_parser(install_subparsers)
-
-    # Command: `dotfiles uninstall`
-    uninstall_parser = subparsers.add_parser(
-        'uninstall',
-        description='Uninstall something',
-        help='uninstall somthing',
-        formatter_class=_HelpFormatter,
-    )
-    uninstall_subparsers = uninstall_parser.add_subparsers(
-        title='commands',
-        dest='subcommand',
-    )
+    # Commands: `dotfiles osinfo`, `dotfiles repos`, `dotfiles repos-status`, `dotfiles repos-sync`, `dotfiles serve`
+    _add_commands(subparsers, (), selected)
 
-    # Command: `dotfiles uninstall php`
-    _add_php_uninstall_parser(uninstall_subparsers)
+    # Commands: `dotfiles install`, `dotfiles uninstall`
+    for group in _GROUPS:
+        group_parser = subparsers.add_parser(
+            group.name,
+            description=group.description,
+            help=group.help,
+            formatter_class=_HelpFormatter,
+            # A group only picks the command, the answer options go before or after it
+            parents=[],
+        )
+        group_subparsers = group_parser.add_subparsers(
+            title='commands',
+            dest='subcommand',
+            action=_CommandParsersAction,
+        )
+        _add_commands(group_subparsers, (group.name,), selected)
 
     return parser
 
@@ -83,21 +228,45 @@ def _handle_completion(args: Namespace) -> None:
     command = getattr(args, 'command', None)
 
     if not command:
-        print('install osinfo repos uninstall')
-    elif command == 'install':
-        print('php')
-    elif command == 'uninstall':
-        print('php')
+        print(*sorted({c.path[0] for c in _COMMANDS}))
     elif command == 'repos':
-        _cmd_repos_completion(args)
+        from dotfiles.repos import cmd_repos_completion
+        cmd_repos_completion(args)
+    else:
+        print(*[c.path[1] for c in _COMMANDS if c.path[0] == command and len(c.path) == 2])
 
     sys.exit(0)
 
 
+def _preseed_answers(args: Namespace) -> None:
+    """Give console the answers of --yes, --answers-file and --answer"""
+    answers = {}
+
+    if args.answers_file:
+        try:
+            answers.update(console.read_answers_file(args.answers_file))
+        except OSError as ex:
+            raise ValidationError('dotfiles', f"Can't read the answers file: {ex}") from ex
+        except InvalidAnswerError as ex:
+            raise ValidationError('dotfiles', str(ex)) from ex
+
+    for answer in [*args.answer, *getattr(args, 'command_answer', [])]:
+        key, sep, value = answer.partition('=')
+        if not sep or not key.strip():
+            raise ValidationError('dotfiles', f'Invalid answer "{answer}", expected KEY=VALUE')
+        answers[key.strip()] = value.strip()
+
+    console.preseed(answers, assume_yes=args.yes)
+
+
 def cli() -> None:
     """Command line interface entry point"""
-    parser = _build_parser()
-    args = parser.parse_args()
+    argv = tracing.configure(sys.argv[1:])
+    tracing.record('import', 'cli', tracing.START, time.perf_counter())
+
+    with tracing.span('build parser'):
+        parser = _build_parser(argv)
+        args = parser.parse_args(argv)
 
     if args.completion:
         _handle_completion(args)
@@ -107,8 +276,11 @@ def cli() -> None:
         sys.exit(1)
 
     try:
-        args.handler(args)
-    except ValidationError as ex:
+        _preseed_answers(args)
+        command = ' '.join(filter(None, (args.command, getattr(args, 'subcommand', None))))
+        with tracing.span('handler', command=command):
+            args.handler(args)
+    except (ValidationError, MissingAnswerError, InvalidAnswerError) as ex:
         print(f"error: {ex}", file=sys.stderr)
         sys.exit(1)
     except KeyboardInterrupt:
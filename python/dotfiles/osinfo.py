@@ -1,9 +1,21 @@
 import csv
+import json
 import os
 import platform
+import shlex
+import subprocess
 import sys
+import time
 from argparse import ArgumentParser, Namespace, _SubParsersAction
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
+
+from dotfiles.paths import cache_path
+
+# Bump when the snapshot's variables change (shell/shared/functions.sh checks it)
+SNAPSHOT_VERSION = 2
+_MAC_RELEASE_PATH = '/System/Library/CoreServices/SystemVersion.plist'
+_BOOT_ID_PATH = '/proc/sys/kernel/random/boot_id'
 
 
 def __get_release_path() -> Optional[str]:
@@ -32,9 +44,17 @@ def get_release() -> dict:
     In python 3.10 they introduced the 'freedesktop_os_release' function so if
     we have it we use it. But for older versions I've included a polyfill.
 
+    The release file is only read once per process.
+
     Returns:
         dict: The OS release details
     """
+    return dict(_read_release())
+
+
+@lru_cache(maxsize=None)
+def _read_release() -> dict:
+    """Read and parse the os-release file (see get_release())"""
     if ostype() not in ['linux', 'freebsd']:
         return {}
 
@@ -63,7 +83,7 @@ def get_release_value(key) -> str:
     Returns:
         str: The release value
     """
-    return get_release().get(key, '')
+    return _read_release().get(key, '')
 
 
 def id() -> str:
@@ -113,6 +133,7 @@ def name() -> str:
     return platform.system()
 
 
+@lru_cache(maxsize=None)
 def ostype() -> str:
     """Get the type of operating system."""
     if sys.platform in ['win32', 'win64', 'cygwin']:
@@ -150,8 +171,250 @@ def version() -> str:
     return get_release_value('VERSION_ID')
 
 
+@lru_cache(maxsize=None)
+def _get_facts() -> tuple:
+    """Get every OS fact, computed once per process"""
+    return (
+        ('name', name()),
+        ('pretty_name', pretty_name()),
+        ('id', id()),
+        ('id_like', ' '.join(id_like())),
+        ('codename', codename()),
+        ('version', version()),
+        ('ostype', ostype()),
+    )
+
+
+def facts() -> dict:
+    """Get every OS fact (name, pretty_name, id, id_like, codename, version, ostype) in one go"""
+    return dict(_get_facts())
+
+
+def _probe_systemctl(timeout: float) -> Optional[bool]:
+    """Check if a graphical target is the default systemd target, None if systemctl timed out"""
+    try:
+        process = subprocess.run(
+            ['systemctl', 'get-default'],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            check=False,
+            timeout=timeout,
+        )
+    except OSError:
+        return False
+    except subprocess.TimeoutExpired:
+        return None
+    return b'graphical' in process.stdout
+
+
+def _probe_sessions(path: str) -> bool:
+    """Check if any X/Wayland sessions are installed"""
+    try:
+        return bool(os.listdir(path))
+    except OSError:
+        return False
+
+
+def _detect_environment(timeout: float) -> Tuple[str, bool]:
+    """Detect the environment (see detect_environment())
+
+    Returns:
+        tuple: The environment, and whether it's certain. A 'server' decided by
+               probes that timed out isn't: a slow systemctl isn't a server.
+    """
+    system_type = ostype()
+
+    if system_type == 'mac':
+        return 'mac', True
+
+    if system_type != 'linux':
+        return '', True
+
+    # Imported here so that the other osinfo commands don't pay for it
+    from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+    deadline = time.monotonic() + timeout
+    certain = True
+    executor = ThreadPoolExecutor(max_workers=3)
+    try:
+        pending = {
+            executor.submit(_probe_systemctl, timeout),
+            executor.submit(_probe_sessions, '/usr/share/xsessions'),
+            executor.submit(_probe_sessions, '/usr/share/wayland-sessions'),
+        }
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                certain = False
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            results = [future.result() for future in done]
+            if any(results):
+                return 'linux', True
+            if None in results:
+                certain = False
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return 'server', certain
+
+
+def detect_environment(timeout: float = 2.0) -> str:
+    """Detect the kind of environment the dotfiles are installed for (linux|mac|server).
+
+    Linux machines are desktops (linux) when a graphical target is the default
+    or X/Wayland sessions are installed, servers otherwise. The probes run
+    concurrently and the first positive one wins; whatever hasn't answered
+    within the timeout counts as negative. Returns an empty string for other
+    operating systems.
+    """
+    return _detect_environment(timeout)[0]
+
+
+@lru_cache(maxsize=None)
+def environment() -> str:
+    """Get the kind of environment the dotfiles are installed for (linux|mac|server).
+
+    Uses the snapshot when it's fresh, otherwise detects the environment and
+    refreshes the snapshot. A detection that timed out is stored as uncertain
+    and done again next time.
+    """
+    snapshot = _read_snapshot(snapshot_path())
+    if snapshot is not None and snapshot.get('OSINFO_ENV_CERTAIN') == '1':
+        return snapshot['OSINFO_ENV']
+
+    env, certain = _detect_environment(2.0)
+    try:
+        write_snapshot(snapshot_path(), env, certain)
+    except OSError:
+        pass
+    return env
+
+
+def clear_cache() -> None:
+    """Forget the cached facts (e.g. between the requests of `dotfiles serve`)"""
+    for function in (_read_release, ostype, _get_facts, environment):
+        function.cache_clear()
+
+
+def _get_boot_id() -> str:
+    """Get the id of the current boot (linux only)"""
+    try:
+        with open(_BOOT_ID_PATH, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return ''
+
+
+def _get_release_mtime() -> int:
+    """Get the mtime of the os-release file (SystemVersion.plist on macOS), 0 if there isn't one"""
+    for path in (__get_release_path(), _MAC_RELEASE_PATH):
+        if path and os.path.exists(path):
+            return os.stat(path).st_mtime_ns
+    return 0
+
+
+def snapshot_path() -> str:
+    """Get the default path of the OS facts snapshot"""
+    return cache_path('osinfo.sh')
+
+
+def _read_snapshot(path: str) -> Optional[dict]:
+    """Read the variables of a snapshot, None if it's missing or stale"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+
+    variables = {}
+    for line in lines:
+        if line and not line.startswith('#') and '=' in line:
+            key, value = line.split('=', 1)
+            values = shlex.split(value)
+            variables[key] = values[0] if values else ''
+
+    if (
+        variables.get('OSINFO_SNAPSHOT_VERSION') != str(SNAPSHOT_VERSION)
+        or variables.get('OSINFO_BOOT_ID') != _get_boot_id()
+        or variables.get('OSINFO_RELEASE_MTIME') != str(_get_release_mtime())
+    ):
+        return None
+
+    return variables
+
+
+def write_snapshot(path: str, env: Optional[str] = None, env_certain: bool = True) -> None:
+    """Write every OS fact to a sourceable shell file.
+
+    The file records the boot id and os-release mtime it was made with, so
+    shells can tell when it's stale without running python.
+
+    Args:
+        path (str): The snapshot path
+        env (str): The environment (default: detected)
+        env_certain (bool): Whether the given environment is certain (see _detect_environment())
+    """
+    if env is None:
+        env, env_certain = _detect_environment(2.0)
+
+    lines = [
+        '# Generated by `dotfiles osinfo --snapshot`, do not edit',
+        f"OSINFO_SNAPSHOT_VERSION={SNAPSHOT_VERSION}",
+        f"OSINFO_BOOT_ID={shlex.quote(_get_boot_id())}",
+        f"OSINFO_RELEASE_MTIME={_get_release_mtime()}",
+        format_facts(facts(), 'env'),
+        f"OSINFO_ENV={shlex.quote(env)}",
+        f"OSINFO_ENV_CERTAIN={int(env_certain)}",
+    ]
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+
+
+def format_facts(facts_: dict, format_: str) -> str:
+    """Format OS facts as text, json or sourceable shell variables (OSINFO_ID=...)"""
+    if format_ == 'json':
+        return json.dumps(facts_, indent=2)
+    if format_ == 'env':
+        return '\n'.join(f"OSINFO_{key.upper()}={shlex.quote(str(value))}" for key, value in facts_.items())
+    return '\n'.join(f"{key}: {value}" for key, value in facts_.items())
+
+
 def _configure_parser(p: ArgumentParser) -> None:
     """Add osinfo arguments to a parser or subparser"""
+    p.add_argument(
+        '-a',
+        '--all',
+        action='store_true',
+        default=False,
+        help='get every fact at once'
+    )
+    p.add_argument(
+        '--format',
+        type=str,
+        choices=('text', 'json', 'env'),
+        default='text',
+        help='the output format of --all (default: text)'
+    )
+    p.add_argument(
+        '-e',
+        '--env',
+        action='store_true',
+        default=False,
+        help='get the environment type (linux|mac|server)'
+    )
+    p.add_argument(
+        '--snapshot',
+        nargs='?',
+        const='',
+        default=None,
+        metavar='PATH',
+        help='write every fact to a sourceable shell file (default: ~/.cache/dotfiles/osinfo.sh)'
+    )
     p.add_argument(
         '-c',
         '--codename',
@@ -210,13 +473,23 @@ def add_parser(subparsers: _SubParsersAction) -> ArgumentParser:
 
 def cmd_osinfo(args: Namespace) -> None:
     """Handle the `dotfiles osinfo` command"""
-    keys = ('codename', 'id', 'like', 'pretty', 'simplified', 'version')
+    keys = ('all', 'codename', 'env', 'id', 'like', 'pretty', 'simplified', 'version')
     given = [k for k in keys if getattr(args, k, False)]
+    if args.snapshot is not None:
+        given.append('snapshot')
     if len(given) > 1:
         print("error: only one option may be specified at a time", file=sys.stderr)
         sys.exit(1)
 
-    if args.version:
+    if args.snapshot is not None:
+        path = args.snapshot or snapshot_path()
+        write_snapshot(path)
+        print(path)
+    elif args.all:
+        print(format_facts(facts(), args.format))
+    elif args.env:
+        print(environment())
+    elif args.version:
         print(version())
     elif args.id:
         print(id())
@@ -11,3 +11,15 @@ def home_path(*paths: str) -> str:
     """Get the home directory path or a path within the home directory"""
     home_directory_path = os.path.expanduser(f"~{getuser()}")
     return os.path.join(home_directory_path, *paths) if len(paths) > 0 else home_directory_path
+
+
+def cache_path(*paths: str) -> str:
+    """Get the dotfiles cache directory path or a path within the cache directory"""
+    cache_directory_path = os.environ.get('XDG_CACHE_HOME') or home_path('.cache')
+    return os.path.join(cache_directory_path, 'dotfiles', *paths)
+
+
+def data_path(*paths: str) -> str:
+    """Get the dotfiles data directory path or a path within the data directory"""
+    data_directory_path = os.environ.get('XDG_DATA_HOME') or home_path('.local', 'share')
+    return os.path.join(data_directory_path, 'dotfiles', *paths)
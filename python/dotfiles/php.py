@@ -3,16 +3,16 @@ import os
 import re
 import shutil
 import sys
-import tempfile
+import threading
 from argparse import ArgumentParser, Namespace, _SubParsersAction
-from subprocess import CalledProcessError
+from http.client import HTTPException
 from typing import Optional, Tuple, List
 from urllib import request
 
-from dotfiles import console, osinfo, run
+from dotfiles import apt, console, dpkg, osinfo, run
 from dotfiles.errors import ValidationError
-from dotfiles.paths import home_path
-from dotfiles.utils import array_unique, is_cmd_installed
+from dotfiles.paths import cache_path, home_path
+from dotfiles.utils import array_exclude, array_unique, is_cmd_installed
 
 
 _DESKTOP_EXTENSIONS: Tuple[str, ...] = (
@@ -40,6 +40,10 @@ _SERVER_EXTENSIONS: Tuple[str, ...] = (
 _EXTENSION_TYPES: Tuple[str, ...] = ('desktop', 'server')
 
 _DEFAULT_COMPOSER_DIR = '/usr/local/bin'
+_COMPOSER_SIGNATURE_URL = 'https://composer.github.io/installer.sig'
+_COMPOSER_INSTALLER_URL = 'https://getcomposer.org/installer'
+_CHUNK_SIZE = 64 * 1024
+_DEFAULT_UPDATE_TTL = 3600.0
 
 
 def _get_extensions(env: str) -> Tuple[str, ...]:
@@ -51,28 +55,44 @@ def _get_extensions(env: str) -> Tuple[str, ...]:
     return ()
 
 
+def _get_sources_prerequisites(os_id: str) -> List[str]:
+    """Get the packages needed to add the php apt repository"""
+    if os_id == 'ubuntu':
+        return ['apt-transport-https', 'ca-certificates', 'software-properties-common', 'lsb-release']
+    if os_id in ['debian', 'raspbian']:
+        return ['apt-transport-https', 'ca-certificates', 'lsb-release', 'curl']
+    return []
+
+
+def _get_missing_packages(packages: List[str]) -> List[str]:
+    """Get the packages that aren't installed yet"""
+    return [package for package, installed in dpkg.installed_many(packages).items() if not installed]
+
+
 def _install_php_sources() -> None:
     """Install the php apt repository"""
     os_id = osinfo.id()
 
+    if os_id not in ['debian', 'raspbian', 'ubuntu']:
+        raise ValidationError('install_php', 'Unsupported OS for PHP repository setup')
+
+    missing = _get_missing_packages(_get_sources_prerequisites(os_id))
+    if missing:
+        run.command('apt install -y', *missing, root=True)
+
     if os_id == 'ubuntu':
-        packages = ['apt-transport-https', 'ca-certificates', 'software-properties-common', 'lsb-release']
-        run.command('apt install -y', *packages, root=True)
         run.command('add-apt-repository ppa:ondrej/php -y', root=True)
         return
 
-    if os_id in ['debian', 'raspbian']:
-        packages = ['apt-transport-https', 'ca-certificates', 'lsb-release', 'curl']
-        run.command('apt install -y', *packages, root=True)
-        keyring_url = 'https://packages.sury.org/debsuryorg-archive-keyring.deb'
-        keyring_deb = '/tmp/debsuryorg-archive-keyring.deb'
-        run.command(f'curl -sSLo {keyring_deb} {keyring_url}')
-        run.command(f'dpkg -i {keyring_deb}', root=True)
-        source = 'deb [signed-by=/usr/share/keyrings/deb.sury.org-php.gpg] https://packages.sury.org/php/ $(lsb_release -sc) main'
-        run.command(f'echo "{source}" | sudo tee /etc/apt/sources.list.d/php.list > /dev/null')
-        return
-
-    raise ValidationError('install_php', 'Unsupported OS for PHP repository setup')
+    keyring_url = 'https://packages.sury.org/debsuryorg-archive-keyring.deb'
+    keyring_deb = '/tmp/debsuryorg-archive-keyring.deb'
+    run.command(f'curl -sSLo {keyring_deb} {keyring_url}')
+    run.command(f'dpkg -i {keyring_deb}', root=True)
+    source = (
+        'deb [signed-by=/usr/share/keyrings/deb.sury.org-php.gpg] '
+        'https://packages.sury.org/php/ $(lsb_release -sc) main'
+    )
+    run.command(f'echo "{source}" | sudo tee /etc/apt/sources.list.d/php.list > /dev/null')
 
 
 def _php_sources_installed() -> bool:
@@ -80,50 +100,35 @@ def _php_sources_installed() -> bool:
     os_id = osinfo.id()
 
     if os_id == 'ubuntu':
-        codename = osinfo.codename()
-        if os.path.exists(f"/etc/apt/sources.list.d/ondrej-ubuntu-php-{codename}.list"):
-            return True
-        if os.path.exists(f"/etc/apt/sources.list.d/ondrej-ubuntu-php-{codename}.sources"):
-            return True
-        cmd = r"find /etc/apt/ \( -name '*.list' -o -name '*.sources' \) -exec grep -l 'ondrej' {} \; 2>/dev/null | xargs grep -l 'php' 2>/dev/null"
-        proc = run.command(cmd, check=False, supress_output=True)
-        return proc.returncode == 0
+        return apt.has_source(r'/ondrej/php(/|$)')
 
     if os_id in ['debian', 'raspbian']:
-        if os.path.exists('/etc/apt/sources.list.d/php.list'):
-            return True
-        if os.path.exists('/etc/apt/sources.list.d/sury-php.list'):
-            return True
-        cmd = r"find /etc/apt/ \( -name '*.list' -o -name '*.sources' \) -exec grep -l 'sury' {} \; 2>/dev/null | xargs grep -l 'php' 2>/dev/null"
-        proc = run.command(cmd, check=False, supress_output=True)
-        return proc.returncode == 0
+        return apt.has_source(r'sury\.org/php(/|$)')
 
     return False
 
 
 def _get_available_php_versions() -> List[str]:
-    """Get the available php versions from apt-cache"""
-    try:
-        cmd = r"apt-cache search php | grep -oP '^php[0-9]?[0-9]\.[0-9]' | awk -Fphp '{print $2}' | sort -ru"
-        versions = run.command(cmd, capture_output=True)
-        versions = versions.split('\n') if versions else []
-        return list(filter(bool, versions))
-    except CalledProcessError:
-        return []
+    """Get the php versions available from apt, newest first"""
+    return apt.available_php_versions()
 
 
 def _get_installed_php_packages(version: Optional[str] = None) -> List[str]:
-    """Get the currently installed php packages"""
-    cmd = r"dpkg -l | grep -E '^[a-zA-Z]*\s*php%s' | sed 's/^[a-zA-Z]*\s*//' | sed 's/\s\{3,\}.*$//' | tr '\n' ' '"
-    packages = run.command(cmd % (version or '*'), capture_output=True)
-    packages = packages.strip().split(' ')
-    return list(filter(bool, packages))
+    """Get the php packages known to dpkg (installed or with config files left behind)
+
+    With a version, only that version's packages: `php8.1` and `php8.1-*`, not `php8.10-*`.
+    """
+    packages = dpkg.load().with_prefix(f"php{version or ''}")
+    if version:
+        name = f"php{version}"
+        packages = [package for package in packages if package.name == name or package.name.startswith(name + '-')]
+    return [package.name for package in packages if package.state != 'not-installed']
 
 
 def _get_uninstallable_versions() -> Tuple[str, ...]:
     """Get php versions that can be uninstalled"""
     versions = map(
-        lambda package: re.search(r'php(\d\.\d)?.*', package).group(1),
+        lambda package: re.search(r'php(\d+\.\d+)?.*', package).group(1),
         _get_installed_php_packages()
     )
     return array_unique(tuple(filter(bool, list(versions))))
@@ -142,42 +147,251 @@ def _find_composer_installations() -> List[str]:
     return [p for p in candidates if os.path.isfile(p)]
 
 
+def _download(url: str, path: str, cancel: Optional[threading.Event] = None) -> str:
+    """Stream a download to a file, hashing it on the way
+
+    Returns:
+        str: The sha384 hex digest of what was downloaded
+
+    Raises:
+        InterruptedError: The download was cancelled
+    """
+    digest = hashlib.sha384()
+    with request.urlopen(url) as response, open(path, 'wb') as file:
+        for chunk in iter(lambda: response.read(_CHUNK_SIZE), b''):
+            if cancel is not None and cancel.is_set():
+                raise InterruptedError(f"Download of {url} cancelled")
+            digest.update(chunk)
+            file.write(chunk)
+    return digest.hexdigest()
+
+
+def _hash_file(path: str) -> Optional[str]:
+    """Get the sha384 hex digest of a file, None if it can't be read"""
+    digest = hashlib.sha384()
+    try:
+        with open(path, 'rb') as file:
+            for chunk in iter(lambda: file.read(_CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _get_composer_installer(
+    signature_url: str = _COMPOSER_SIGNATURE_URL,
+    installer_url: str = _COMPOSER_INSTALLER_URL,
+    cancel: Optional[threading.Event] = None,
+) -> Optional[str]:
+    """Get a verified composer installer, downloading it only if it isn't cached yet
+
+    Verified installers are cached under the cache directory by their published
+    sha384 signature, so only the signature is fetched when it hasn't changed.
+
+    Returns:
+        str|None: The installer path, None if the download didn't match the signature
+    """
+    with request.urlopen(signature_url) as response:
+        expected_signature = response.read().decode('utf-8').strip().lower()
+
+    if not re.fullmatch(r'[0-9a-f]{96}', expected_signature):
+        raise ValidationError('install_php', 'Invalid composer installer signature')
+
+    installer_path = cache_path('composer', f"installer-{expected_signature}.php")
+    if _hash_file(installer_path) == expected_signature:
+        return installer_path
+
+    os.makedirs(os.path.dirname(installer_path), exist_ok=True)
+    tmp_path = f"{installer_path}.{os.getpid()}.tmp"
+    try:
+        actual_signature = _download(installer_url, tmp_path, cancel)
+        if actual_signature != expected_signature:
+            return None
+        os.replace(tmp_path, installer_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return installer_path
+
+
 def _install_composer(install_dir: str) -> None:
     """Download and install composer to the given directory"""
     if not is_cmd_installed('php'):
         raise ValidationError('install_php', 'You must install php before you can install composer')
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        setup_path = os.path.join(tmpdir, 'composer-setup.php')
+    installer_path = _get_composer_installer()
+    if installer_path is None:
+        print("Failed to install composer. Hash verification failed.", file=sys.stderr)
+        sys.exit(console.FAILURE)
 
-        with request.urlopen('https://composer.github.io/installer.sig') as response:
-            expected_signature = response.read().decode('utf-8').strip()
+    run.command(
+        f'php "{installer_path}" --install-dir={install_dir} --filename=composer',
+        root=True
+    )
 
-        with request.urlopen('https://getcomposer.org/installer') as response:
-            with open(setup_path, 'wb') as setup_file:
-                setup_file.write(response.read())
 
-        with open(setup_path, 'r', encoding='utf-8') as setup_file:
-            actual_signature = hashlib.sha384(setup_file.read().encode()).hexdigest()
+def _get_version_packages(version: str, env: str) -> List[str]:
+    """Get the packages of a php version for the given environment type"""
+    return [f"php{version}", *[f"php{version}-{ext}" for ext in _get_extensions(env)]]
+
+
+def _make_install_plan(versions: List[str], env: str, sources_installed: bool, update_ttl: float) -> dict:
+    """Work out what installing php versions takes, without changing anything
+
+    Returns:
+        dict: The sources to add (and their prerequisites), whether `apt update`
+            is needed, the packages of each version, and the packages that are
+            already installed or to install (deduplicated, in one transaction)
+    """
+    versions = list(array_unique(versions))
+    packages_by_version = {version: _get_version_packages(version, env) for version in versions}
+    packages = list(array_unique([package for version in versions for package in packages_by_version[version]]))
+    missing = _get_missing_packages(packages)
+    lists_age = apt.lists_age()
+
+    return {
+        'versions': versions,
+        'env': env,
+        'add_sources': not sources_installed,
+        'prerequisites': [] if sources_installed else _get_missing_packages(_get_sources_prerequisites(osinfo.id())),
+        'update': not sources_installed or lists_age is None or lists_age > update_ttl,
+        'lists_age': None if lists_age is None else round(lists_age),
+        'packages': packages_by_version,
+        'installed': [package for package in packages if package not in missing],
+        'install': missing,
+    }
+
+
+def _format_plan(plan: dict, format_: str = 'text') -> str:
+    """Format an install plan as text or json"""
+    if format_ == 'json':
+        # Imported here so that only --plan --format json pays for it
+        import json
+        return json.dumps(plan, indent=2)
+
+    if plan['lists_age'] is None:
+        lists = 'last update unknown'
+    else:
+        lists = f"updated {plan['lists_age']}s ago"
+
+    lines = [f"{', '.join(f'php{version}' for version in plan['versions'])} ({plan['env']})"]
+    if plan['add_sources']:
+        lines.append("Sources: add the php repository")
+        if plan['prerequisites']:
+            lines.append(f"  prerequisites: {' '.join(plan['prerequisites'])}")
+    else:
+        lines.append("Sources: the php repository is configured")
+    lines.append(f"apt update: {'yes' if plan['update'] else 'no'} (package lists {lists})")
+    lines.append("Already installed:")
+    lines.extend(f"  {package}" for package in plan['installed'] or ['-'])
+    lines.append("Packages to be installed:")
+    lines.extend(f"  {package}" for package in plan['install'] or ['-'])
+    return '\n'.join(lines)
+
+
+def _apply_install_plan(plan: dict) -> None:
+    """Add the sources, update the package lists and install the packages of a plan"""
+    if plan['add_sources']:
+        _install_php_sources()
+
+    if plan['update']:
+        run.command('apt update', root=True)
 
-        if actual_signature != expected_signature:
-            print("Failed to install composer. Hash verification failed.", file=sys.stderr)
-            sys.exit(console.FAILURE)
+    if plan['install']:
+        run.command('apt install -y', *plan['install'], root=True)
 
-        run.command(
-            f'php {setup_path} --install-dir={install_dir} --filename=composer',
-            root=True
-        )
+
+def _print_install_summary(plan: dict) -> None:
+    """Print which packages of each version of a plan are installed now"""
+    database = dpkg.load()
+    print()
+    for version, packages in plan['packages'].items():
+        missing = [package for package in packages if not database.is_installed(package)]
+        if missing:
+            print(f"php{version}: {console.colorize('missing ' + ' '.join(missing), 'red')}")
+        else:
+            new = len([package for package in packages if package in plan['install']])
+            counts = f"{new} installed, {len(packages) - new} already installed"
+            print(f"php{version}: {console.colorize('ok', 'green')} ({counts})")
+
+
+class _Prefetch:
+    """Downloads what an install plan needs in the background while the user answers prompts
+
+    The packages are downloaded to apt's cache with `apt-get install --download-only`
+    (after an `apt-get update` if the plan needs one) and the composer installer to
+    the dotfiles cache, so applying the plan afterwards only has to unpack them.
+    sudo is validated first (asking for the password if it needs one), because the
+    background download can't prompt; without it the packages aren't prefetched.
+    Prefetching is best effort: when it fails the install simply downloads
+    everything itself.
+    """
+
+    def __init__(self, plan: dict, composer: bool):
+        self._update = plan['update']
+        self._apt: Optional[run.BackgroundProcess] = None
+        self._composer: Optional[threading.Thread] = None
+        self._cancelled = threading.Event()
+
+        if plan['install'] and not plan['add_sources']:
+            if run.validate_sudo():
+                self._apt = self._download_packages(plan['install'])
+            else:
+                message = "sudo isn't available, the packages will be downloaded by the install"
+                print(console.colorize(message, 'yellow'))
+
+        if composer:
+            self._composer = threading.Thread(target=self._fetch_composer, daemon=True)
+            self._composer.start()
+
+    def _download_packages(self, packages: List[str]) -> Optional[run.BackgroundProcess]:
+        """Start downloading the packages to apt's cache, updating the package lists first if needed"""
+        download = ['apt-get', 'install', '-y', '-qq', '--download-only', *packages]
+        if self._update:
+            download = ['sh', '-c', 'apt-get update -qq && "$@"', 'sh', *download]
+        try:
+            return run.background(download, root=True)
+        except OSError:
+            return None
+
+    def _fetch_composer(self) -> None:
+        """Download the composer installer to the cache, any failure is left for the install to report"""
+        try:
+            _get_composer_installer(cancel=self._cancelled)
+        except (OSError, HTTPException, ValidationError):
+            pass
+
+    def finish(self) -> bool:
+        """Wait for the downloads to finish
+
+        Returns:
+            bool: Whether the package lists were updated by the prefetch
+        """
+        updated = False
+        if self._apt is not None:
+            updated = self._apt.wait() == 0 and self._update
+        if self._composer is not None:
+            self._composer.join()
+        return updated
+
+    def cancel(self) -> None:
+        """Stop the downloads"""
+        self._cancelled.set()
+        if self._apt is not None:
+            self._apt.cancel()
+        if self._composer is not None:
+            self._composer.join(5.0)
 
 
 def _configure_install_parser(p: ArgumentParser) -> None:
     """Add install-php arguments to a parser or subparser"""
     p.add_argument(
         'version',
-        nargs='?',
+        nargs='*',
         type=str,
-        default=None,
-        help='the php version to install'
+        default=[],
+        help='the php version(s) to install'
     )
     p.add_argument(
         '-e',
@@ -195,6 +409,25 @@ def _configure_install_parser(p: ArgumentParser) -> None:
         metavar='DIR',
         help='also install composer (optionally specify install directory, default: /usr/local/bin)'
     )
+    p.add_argument(
+        '--plan',
+        action='store_true',
+        default=False,
+        help='print what would be done and exit'
+    )
+    p.add_argument(
+        '--format',
+        choices=('text', 'json'),
+        default='text',
+        help='the --plan output format (default: text)'
+    )
+    p.add_argument(
+        '--update-ttl',
+        type=float,
+        default=_DEFAULT_UPDATE_TTL,
+        metavar='SECONDS',
+        help=f'skip apt update when the package lists are newer than this (default: {_DEFAULT_UPDATE_TTL:g})'
+    )
     p.set_defaults(handler=cmd_install_php)
 
 
@@ -209,13 +442,124 @@ def add_install_parser(subparsers: _SubParsersAction) -> ArgumentParser:
     return p
 
 
+def _print_plan(args: Namespace, sources_installed: bool) -> None:
+    """Print the install plan of the given versions (`--plan`)"""
+    available_versions = _get_available_php_versions() if sources_installed else None
+    if not args.version or (
+        available_versions is not None and any(v not in available_versions for v in args.version)
+    ):
+        raise ValidationError('install_php', 'Available php version(s) are required with --plan')
+    # Nobody is asked with --plan: the environment is the given or preseeded one, else desktop
+    env = args.env or (_select_env(None) if console.has_answer('install_php.env') else 'desktop')
+    plan = _make_install_plan(args.version, env, sources_installed, args.update_ttl)
+    print(_format_plan(plan, args.format))
+
+
+def _select_versions(requested: List[str], installable_versions: List[str]) -> List[str]:
+    """Get the requested versions that can be installed, asking for one if there are none"""
+    versions = [version for version in requested if version in installable_versions]
+    for version in array_exclude(requested, installable_versions):
+        print(f"php{version} is not available", file=sys.stderr)
+
+    if versions:
+        return versions
+
+    version = console.choice(
+        "Which version would you like to install?",
+        installable_versions,
+        default=0,
+        key='install_php.version',
+    )
+    if not version:
+        raise ValidationError('install_php', 'Invalid php version')
+    return [version]
+
+
+def _select_env(env: Optional[str]) -> str:
+    """Get the environment type, asking for it if it wasn't given"""
+    if env is not None and env in _EXTENSION_TYPES:
+        return env
+
+    env = console.choice(
+        "What kind of environment is this for?",
+        list(_EXTENSION_TYPES),
+        default='desktop',
+        key='install_php.env',
+    )
+    if not env:
+        raise ValidationError('install_php', 'Invalid environment')
+    return env
+
+
+def _confirm_plan(plan: dict, prefetch_composer: bool) -> bool:
+    """Show the plan and ask to proceed, downloading what it needs in the meantime
+
+    Returns:
+        bool: Whether to proceed
+    """
+    prefetch = _Prefetch(plan, composer=prefetch_composer)
+
+    try:
+        print()
+        print(_format_plan(plan))
+
+        print()
+        if not console.confirm('Proceed?', key='install_php.proceed'):
+            prefetch.cancel()
+            return False
+
+        if prefetch.finish():
+            plan['update'] = False
+    except BaseException:
+        prefetch.cancel()
+        raise
+
+    return True
+
+
+def _install_composer_step(composer_dir: Optional[str]) -> None:
+    """Install composer to the given directory, or offer to install it if there isn't one"""
+    existing = _find_composer_installations()
+
+    if composer_dir is not None:
+        target = os.path.join(composer_dir, 'composer')
+        outside = [p for p in existing if os.path.abspath(p) != os.path.abspath(target)]
+        if outside:
+            print()
+            print("Warning: existing composer installation(s) found outside the target directory:")
+            for p in outside:
+                print(f"  {p}")
+        print()
+        print(f"Installing composer to {composer_dir}...")
+        _install_composer(composer_dir)
+    elif not existing:
+        print()
+        if console.confirm('Install composer?', key='install_php.composer'):
+            _install_composer(_DEFAULT_COMPOSER_DIR)
+    else:
+        print()
+        print("Composer already installed:")
+        for p in existing:
+            print(f"  {p}")
+
+
 def cmd_install_php(args: Namespace) -> None:
     """Install PHP (and optionally composer)"""
     if osinfo.id() not in ['debian', 'raspbian', 'ubuntu']:
         raise ValidationError('install_php', 'Your operating system is not supported')
 
+    if args.update_ttl < 0:
+        raise ValidationError('install_php', 'Invalid update ttl')
+
     try:
-        if not _php_sources_installed():
+        sources_installed = _php_sources_installed()
+
+        if args.plan:
+            _print_plan(args, sources_installed)
+            return
+
+        if not sources_installed:
+            # The available versions are only known once the repository is added
             _install_php_sources()
             run.command('apt update', root=True)
 
@@ -227,65 +571,17 @@ def cmd_install_php(args: Namespace) -> None:
             print()
             sys.exit(console.FAILURE)
 
-        version = args.version
-        if version is None or version not in installable_versions:
-            version = console.choice(
-                "Which version would you like to install?",
-                installable_versions,
-                default=0
-            )
-            if not version:
-                raise ValidationError('install_php', 'Invalid php version')
-
-        env = args.env
-        if env is None or env not in _EXTENSION_TYPES:
-            env = console.choice(
-                "What kind of environment is this for?",
-                list(_EXTENSION_TYPES),
-                default='desktop'
-            )
-            if not env:
-                raise ValidationError('install_php', 'Invalid environment')
-
-        extensions = _get_extensions(env)
-        packages = [f"php{version}", *[f"php{version}-{ext}" for ext in extensions]]
-
-        print()
-        print("Packages to be installed:")
-        print(*packages, sep='\n')
+        versions = _select_versions(args.version, installable_versions)
+        env = _select_env(args.env)
 
-        print()
-        if not console.confirm('Proceed?'):
+        plan = _make_install_plan(versions, env, True, args.update_ttl)
+        if not _confirm_plan(plan, args.composer is not None or not _find_composer_installations()):
             print("Exiting...")
             return
 
-        run.command('apt update', root=True)
-        run.command('apt install -y', *packages, root=True)
-
-        # Composer step
-        composer_dir = args.composer  # None, or a directory path
-        existing = _find_composer_installations()
-
-        if composer_dir is not None:
-            target = os.path.join(composer_dir, 'composer')
-            outside = [p for p in existing if os.path.abspath(p) != os.path.abspath(target)]
-            if outside:
-                print()
-                print("Warning: existing composer installation(s) found outside the target directory:")
-                for p in outside:
-                    print(f"  {p}")
-            print()
-            print(f"Installing composer to {composer_dir}...")
-            _install_composer(composer_dir)
-        elif not existing:
-            print()
-            if console.confirm('Install composer?'):
-                _install_composer(_DEFAULT_COMPOSER_DIR)
-        else:
-            print()
-            print("Composer already installed:")
-            for p in existing:
-                print(f"  {p}")
+        _apply_install_plan(plan)
+        _print_install_summary(plan)
+        _install_composer_step(args.composer)
 
     except KeyboardInterrupt:
         print()
@@ -296,10 +592,10 @@ def _configure_uninstall_parser(p: ArgumentParser) -> None:
     """Add uninstall-php arguments to a parser or subparser"""
     p.add_argument(
         'version',
-        nargs='?',
+        nargs='*',
         type=str,
-        default=None,
-        help='the php version to uninstall'
+        default=[],
+        help='the php version(s) to uninstall, or all'
     )
     p.add_argument(
         '--composer',
@@ -321,6 +617,57 @@ def add_uninstall_parser(subparsers: _SubParsersAction) -> ArgumentParser:
     return p
 
 
+def _select_uninstall_versions(requested: List[str], uninstallable_versions: Tuple[str, ...]) -> List[str]:
+    """Get the requested versions that are installed, or ask which one to uninstall"""
+    if 'all' in requested:
+        return list(uninstallable_versions)
+
+    versions = [version for version in array_unique(requested) if version in uninstallable_versions]
+    for version in array_exclude(requested, uninstallable_versions):
+        print(f"No packages found for php{version}", file=sys.stderr)
+
+    if not versions:
+        version = console.choice(
+            "Which version would you like to uninstall?",
+            list(uninstallable_versions),
+            default=0,
+            key='uninstall_php.version',
+        )
+        if not version:
+            raise ValidationError('uninstall_php', 'Invalid php version')
+        versions = [version]
+
+    return versions
+
+
+def _print_uninstall_summary(packages_by_version: dict) -> None:
+    """Print which versions still have packages installed after the purge"""
+    print()
+    for version, packages in packages_by_version.items():
+        remaining = _get_installed_php_packages(version)
+        if remaining:
+            print(f"php{version}: {console.colorize('still installed ' + ' '.join(remaining), 'red')}")
+        else:
+            print(f"php{version}: {console.colorize('ok', 'green')} ({len(packages)} removed)")
+
+
+def _uninstall_composer(composer: bool, is_last_version: bool) -> None:
+    """Remove composer if asked to, or offer to when no php version remains"""
+    if composer:
+        composer_path = os.path.join(_DEFAULT_COMPOSER_DIR, 'composer')
+        if os.path.isfile(composer_path):
+            run.command(f'rm "{composer_path}"', root=True)
+        else:
+            print("Composer not found, skipping...")
+    elif is_last_version:
+        existing = _find_composer_installations()
+        if existing:
+            print()
+            if console.confirm('No PHP versions remain. Uninstall composer?', key='uninstall_php.composer'):
+                for p in existing:
+                    run.command(f'rm "{p}"', root=True)
+
+
 def cmd_uninstall_php(args: Namespace) -> None:
     """Uninstall PHP (and optionally composer)"""
     if osinfo.id() not in ['debian', 'raspbian', 'ubuntu']:
@@ -335,21 +682,14 @@ def cmd_uninstall_php(args: Namespace) -> None:
             print()
             sys.exit(console.SUCCESS)
 
-        version = args.version
-        if version is None or version not in uninstallable_versions:
-            version = console.choice(
-                "Which version would you like to uninstall?",
-                list(uninstallable_versions),
-                default=0
-            )
-            if not version:
-                raise ValidationError('uninstall_php', 'Invalid php version')
+        versions = _select_uninstall_versions(args.version, uninstallable_versions)
 
-        packages = _get_installed_php_packages(version)
+        packages_by_version = {version: _get_installed_php_packages(version) for version in versions}
+        packages = list(array_unique([package for version in versions for package in packages_by_version[version]]))
 
         if not packages:
             print()
-            print(f"No packages found for php{version}")
+            print(f"No packages found for {', '.join(f'php{version}' for version in versions)}")
             print()
             sys.exit(console.SUCCESS)
 
@@ -358,29 +698,17 @@ def cmd_uninstall_php(args: Namespace) -> None:
         print(*packages, sep='\n')
 
         print()
-        if not console.confirm('Proceed?'):
+        if not console.confirm('Proceed?', key='uninstall_php.proceed'):
             print("Exiting...")
             return
 
-        is_last_version = len(uninstallable_versions) == 1
+        is_last_version = all(version in versions for version in uninstallable_versions)
 
         run.command('apt purge -y', *packages, root=True)
         run.command('apt autoremove -y', root=True)
 
-        # Composer removal
-        if args.composer:
-            composer_path = os.path.join(_DEFAULT_COMPOSER_DIR, 'composer')
-            if os.path.isfile(composer_path):
-                run.command(f'rm "{composer_path}"', root=True)
-            else:
-                print("Composer not found, skipping...")
-        elif is_last_version:
-            existing = _find_composer_installations()
-            if existing:
-                print()
-                if console.confirm('No PHP versions remain. Uninstall composer?'):
-                    for p in existing:
-                        run.command(f'rm "{p}"', root=True)
+        _print_uninstall_summary(packages_by_version)
+        _uninstall_composer(args.composer, is_last_version)
 
     except KeyboardInterrupt:
         print()
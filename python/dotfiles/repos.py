@@ -1,18 +1,27 @@
 import os
 import sys
+import time
+import zlib
+from bisect import bisect_left
 from argparse import ArgumentParser, Namespace, _SubParsersAction
 from collections import OrderedDict
 from configparser import ConfigParser
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
 
-from dotfiles import console
+from dotfiles import console, frecency
 from dotfiles.errors import ValidationError
-from dotfiles.paths import home_path
+from dotfiles.paths import cache_path, data_path, home_path
+from dotfiles.utils import read_json_cache, write_json_cache
 
 SECTION_NAME = 'repos'
+INDEX_VERSION = 4
 
+# Directories that are never descended into when looking for nested repos
+_SKIPPED_DIRECTORIES = frozenset(('node_modules', 'vendor'))
 
-def _get_repo_aliases(repos_directory: str, aliases_file: str) -> dict:
-    """Gets the repo aliases from the repo aliases file."""
+
+def _read_aliases_file(aliases_file: str) -> dict:
+    """Reads the explicit aliases from the repo aliases file."""
     aliases_config = {}
 
     try:
@@ -23,30 +32,525 @@ def _get_repo_aliases(repos_directory: str, aliases_file: str) -> dict:
     except FileNotFoundError:
         pass
 
-    aliases = {key: os.path.expanduser(path) for (key, path) in aliases_config}
+    return {key: os.path.expanduser(path) for (key, path) in aliases_config}
+
+
+def is_git_repo(path: str) -> bool:
+    """Check if a directory is the root of a git repository.
+
+    Worktrees and submodules have a `.git` file instead of a directory.
+    """
+    return os.path.exists(os.path.join(path, '.git'))
+
+
+def _is_skipped_directory(name: str) -> bool:
+    """Check if a directory should not be descended into when looking for nested repos"""
+    return name.startswith('.') or name in _SKIPPED_DIRECTORIES
+
+
+def _scan_directory(path: str, depth: int, max_depth: int) -> Tuple[Optional[List[int]], List[tuple]]:
+    """Scan one directory for repos.
+
+    The subdirectories at the max depth that aren't repos aren't scanned, so their
+    signatures are taken here instead (a `git init` in one only changes its mtime).
+
+    Returns:
+        tuple: The directory's signature and the (name, path, is_repo, signature) of its subdirectories
+    """
+    signature = _stat_signature(path)
+    entries = []
+
+    try:
+        with os.scandir(path) as it:
+            for f in it:
+                try:
+                    if not f.is_dir():
+                        continue
+                except OSError:
+                    continue
+
+                if max_depth == 1:
+                    entries.append((f.name, os.path.abspath(f.path), True, None))
+                elif not _is_skipped_directory(f.name):
+                    entry_path = os.path.abspath(f.path)
+                    is_repo = is_git_repo(entry_path)
+                    at_max_depth = not is_repo and depth == max_depth
+                    entries.append((f.name, entry_path, is_repo, _stat_signature(entry_path) if at_max_depth else None))
+    except OSError:
+        pass
+
+    return signature, entries
+
+
+def _scan_level(executor, level: List[Tuple[str, str]], depth: int, max_depth: int) -> Iterable[tuple]:
+    """Scan the directories of one level of the repos tree, concurrently if there is more than one"""
+    paths = [path for _, path in level]
+    if len(paths) == 1:
+        return [_scan_directory(paths[0], depth, max_depth)]
+    return executor.map(_scan_directory, paths, [depth] * len(paths), [max_depth] * len(paths))
+
+
+def _add_entries(
+    repos: Dict[str, str],
+    directories: List[list],
+    prefix: str,
+    entries: List[tuple],
+    descend: bool,
+) -> List[Tuple[str, str]]:
+    """Add a scanned directory's repos and the signatures of its leaf directories.
+
+    Returns:
+        list: The (prefix, path) of the subdirectories to descend into
+    """
+    next_level = []
+    for name, path, is_repo, signature in entries:
+        if is_repo:
+            repos[prefix + name] = path
+        elif descend:
+            next_level.append((f"{prefix}{name}/", path))
+        else:
+            directories.append([path, signature])
+    return next_level
+
+
+def _discover_repos(repos_directory: str, max_depth: int = 1) -> Tuple[Dict[str, str], List[list]]:
+    """Discover the repos in the repos directory.
+
+    With a max depth of 1 every directory in the repos directory is a repo. With
+    a greater max depth only git repos are, other directories are descended into
+    (skipping hidden directories, `node_modules` and `vendor`) and the keys are
+    namespaced by their parent directories, e.g. `org/repo`. Each level of the
+    tree is scanned concurrently.
+
+    Returns:
+        tuple: The repos ({key: path}) and the [path, signature] of every directory a
+               new repo could show up in
+    """
+    # Imported here so that the common index/fast paths don't pay for it
+    from concurrent.futures import ThreadPoolExecutor
+
+    repos = {}
+    directories = []
+    level = [('', os.path.abspath(repos_directory))]
+
+    with ThreadPoolExecutor() as executor:
+        for depth in range(1, max_depth + 1):
+            next_level = []
+            for (prefix, path), (signature, entries) in zip(level, _scan_level(executor, level, depth, max_depth)):
+                directories.append([path, signature])
+                next_level.extend(_add_entries(repos, directories, prefix, entries, depth < max_depth))
+
+            if not next_level:
+                break
+            level = next_level
+
+    return repos, directories
+
+
+def _build_repo_aliases(repos_directory: str, aliases_file: str, max_depth: int = 1) -> Tuple[dict, List[list]]:
+    """Builds the repo aliases from the repo aliases file and the repos directory.
+
+    Returns:
+        tuple: The aliases and the [path, signature] of every directory a new repo could show up in
+    """
+    aliases = _read_aliases_file(aliases_file)
     aliases_paths = list(aliases.values())
-    repos_directory_path = os.path.expanduser(repos_directory)
+    repos, directories = _discover_repos(os.path.expanduser(repos_directory), max_depth)
+
+    for key, path in repos.items():
+        if path not in aliases_paths:
+            aliases[key] = path
+
+    return OrderedDict(sorted(aliases.items())), directories
+
+
+def _get_repo_aliases(repos_directory: str, aliases_file: str, max_depth: int = 1) -> dict:
+    """Gets the repo aliases from the repo aliases file."""
+    return _build_repo_aliases(repos_directory, aliases_file, max_depth)[0]
+
+
+def _is_case_insensitive_match(path: str) -> bool:
+    """Check if a path also resolves with its name's case swapped (case-insensitive filesystems)"""
+    directory, name = os.path.split(path)
+    swapped = os.path.join(directory, name.swapcase())
+    if swapped == path or not os.path.exists(swapped):
+        return False
+    try:
+        return os.path.samefile(path, swapped)
+    except OSError:
+        return False
+
+
+def _resolve_repo_path(repos_directory: str, key: str, max_depth: int) -> Optional[str]:
+    """Find the repo a key points to in the repos directory, without scanning it.
+
+    Returns:
+        str|None: The repo path, None if there isn't one or '' if only a scan can tell
+    """
+    names = key.split('/')
+
+    if len(names) > max_depth or (max_depth == 1 and os.altsep and os.altsep in key):
+        return None
+
+    path = os.path.abspath(repos_directory)
+    for depth, name in enumerate(names, start=1):
+        if not name or name in (os.curdir, os.pardir) or (max_depth > 1 and _is_skipped_directory(name)):
+            return None
+
+        path = os.path.join(path, name)
+        if not os.path.isdir(path):
+            return None
+        if _is_case_insensitive_match(path):
+            return ''
+
+        # Discovery stops at repo roots, so only the last name may be a repo
+        is_repo = max_depth == 1 or is_git_repo(path)
+        if is_repo != (depth == len(names)):
+            return None
+
+    return path
+
+
+def _resolve_repo_alias(repos_directory: str, aliases_file: str, key: str, max_depth: int = 1) -> Optional[str]:
+    """Resolve a single alias key without scanning the repos directory.
+
+    Gives the same result as `_get_repo_aliases(...).get(key)`: a repo in the
+    repos directory with the key wins over an alias with the same key, unless
+    the repo itself is aliased.
+    """
+    aliases = _read_aliases_file(aliases_file)
+    path = _resolve_repo_path(os.path.expanduser(repos_directory), key, max_depth)
+
+    if path == '':
+        # Can't tell a directory's real name from a stat, so fall back to a scan
+        return _get_repo_aliases(repos_directory, aliases_file, max_depth).get(key)
+
+    if path is not None and path not in aliases.values():
+        return path
+
+    return aliases.get(key)
+
+
+def _get_index_path(repos_directory: str, aliases_file: str) -> str:
+    """Get the alias index path for a repos directory and aliases file pair"""
+    checksum = zlib.crc32(f"{repos_directory}\0{aliases_file}".encode('utf-8'))
+    return cache_path(f"repo-aliases-{checksum:08x}.json")
+
+
+def _stat_signature(path: str) -> Optional[List[int]]:
+    """Get the (mtime, size) signature of a path, or None if it doesn't exist"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _is_index_fresh(index: dict, aliases_file: str) -> bool:
+    """Check if nothing the alias index was built from has changed since"""
+    if index.get('file_signature') != _stat_signature(aliases_file):
+        return False
+
+    for path, signature in index.get('directories', []):
+        if _stat_signature(path) != signature:
+            return False
+
+    return True
+
+
+class _IndexKey(NamedTuple):
+    """What an alias index is built from"""
+    repos_path: str
+    file_path: str
+    max_depth: int
+
+
+def _is_index_valid(index: object, key: _IndexKey) -> bool:
+    """Check if a cached alias index is of the current version and was built for the key"""
+    if not isinstance(index, dict) or index.get('version') != INDEX_VERSION:
+        return False
+    return all(index.get(field) == value for field, value in key._asdict().items())
+
+
+def _read_index(index_path: str, key: _IndexKey) -> Optional[dict]:
+    """Read the alias index, returns None if it is missing or stale"""
+    index = read_json_cache(index_path)
+    if not _is_index_valid(index, key) or not _is_index_fresh(index, key.file_path):
+        return None
+
+    # The sorted [key, path] pairs are kept as well, for bisecting
+    index['items'] = index.get('aliases', [])
+    index['aliases'] = OrderedDict(index['items'])
+    return index
+
+
+def _get_names(aliases: dict) -> List[List[str]]:
+    """Get the sorted [name, key] pairs of the namespaced keys (e.g. ['repo', 'org/repo'])"""
+    return sorted([key.rsplit('/', 1)[1], key] for key in aliases if '/' in key)
+
+
+def _write_index(index_path: str, key: _IndexKey, index: dict) -> None:
+    """Write the alias index atomically. Failing to write the index is not an error.
+
+    Args:
+        index_path: The index file
+        key: What the index was built from
+        index: The `file_signature`, the scanned `directories` and the `aliases`
+    """
+    aliases = index['aliases']
+    write_json_cache(index_path, {
+        'version': INDEX_VERSION,
+        **key._asdict(),
+        'file_signature': index['file_signature'],
+        'directories': index['directories'],
+        'aliases': [[alias, path] for alias, path in aliases.items()],
+        'names': _get_names(aliases),
+    })
+
+
+def _load_repo_index(repos_directory: str, aliases_file: str, rebuild: bool = False, max_depth: int = 1) -> dict:
+    """Gets the alias index, rebuilding it when it's stale.
+
+    The index is keyed on the aliases file's mtime/size and the mtimes of the
+    directories a new repo could show up in, so a fresh index is loaded without
+    scanning the repos directory.
+
+    Returns:
+        dict: The index, with the sorted `aliases`, their [key, path] `items` and
+              the `names` of the namespaced keys
+    """
+    repos_directory = os.path.abspath(os.path.expanduser(repos_directory))
+    aliases_file = os.path.abspath(os.path.expanduser(aliases_file))
+    index_path = _get_index_path(repos_directory, aliases_file)
+    index_key = _IndexKey(repos_directory, aliases_file, max_depth)
+
+    if not rebuild:
+        index = _read_index(index_path, index_key)
+        if index is not None:
+            return index
+
+    file_signature = _stat_signature(aliases_file)
+    aliases, directories = _build_repo_aliases(repos_directory, aliases_file, max_depth)
+    _write_index(index_path, index_key, {
+        'file_signature': file_signature,
+        'directories': directories,
+        'aliases': aliases,
+    })
+    return {
+        'aliases': aliases,
+        'items': [[key, path] for key, path in aliases.items()],
+        'names': _get_names(aliases),
+    }
+
+
+def _load_repo_aliases(repos_directory: str, aliases_file: str, rebuild: bool = False, max_depth: int = 1) -> dict:
+    """Gets the repo aliases from the alias index, rebuilding it when it's stale."""
+    return _load_repo_index(repos_directory, aliases_file, rebuild, max_depth)['aliases']
+
+
+def _find_prefix_matches(index: dict, prefix: str) -> List[str]:
+    """Find the keys that start with a prefix, or whose last name does (e.g. `org/repo`)"""
+    matches = []
 
-    if os.path.exists(repos_directory_path) and os.path.isdir(repos_directory_path):
-        for f in os.scandir(repos_directory_path):
-            if not f.is_dir():
-                continue
+    items = index['items']
+    for position in range(bisect_left(items, [prefix]), len(items)):
+        key = items[position][0]
+        if not key.startswith(prefix):
+            break
+        matches.append(key)
 
-            path = os.path.abspath(f.path)
+    names = index['names']
+    for position in range(bisect_left(names, [prefix]), len(names)):
+        name, key = names[position]
+        if not name.startswith(prefix):
+            break
+        if key not in matches:
+            matches.append(key)
 
-            if path not in aliases_paths:
-                aliases[f.name] = path
+    return matches
 
-    return OrderedDict(sorted(aliases.items()))
+
+def _fuzzy_score(query: str, key: str) -> Optional[int]:
+    """Score how well a query matches a key as a subsequence, None if it doesn't match.
+
+    Consecutive characters and characters at the start of a name (after `/`,
+    `-`, `_` or `.`) score higher, skipped characters score lower. Matching is
+    case-insensitive unless the query has uppercase characters.
+    """
+    haystack = key if query != query.lower() else key.lower()
+    score = 0
+    position = 0
+    previous = -2
+
+    for char in query:
+        found = haystack.find(char, position)
+        if found < 0:
+            return None
+        if found == previous + 1:
+            score += 5
+        if found == 0 or key[found - 1] in '/-_.':
+            score += 3
+        score -= min(found - position, 3)
+        previous = found
+        position = found + 1
+
+    return score
+
+
+def _find_matches(index: dict, query: str, scores: frecency.Scores) -> List[str]:
+    """Find the keys matching a query, best first.
+
+    The prefix matches are looked up in the index and ranked by frecency. Only
+    when there are none are the keys matched fuzzily (as subsequences) and
+    ranked by how well they match, then by frecency.
+    """
+    matches = _find_prefix_matches(index, query)
+    if matches or not query:
+        return _rank_matches(matches, scores)
+
+    now = time.time()
+    fuzzy_matches = []
+    for key in index['aliases']:
+        score = _fuzzy_score(query, key)
+        if score is not None:
+            fuzzy_matches.append((-score, -frecency.frecency(scores, key, now), len(key), key))
+
+    return [key for *_, key in sorted(fuzzy_matches)]
+
+
+def _get_usage_path() -> str:
+    """Get the path of the repo usage log (without an extension)"""
+    return data_path('repos-usage')
+
+
+def _rank_matches(matches: List[str], scores: frecency.Scores) -> List[str]:
+    """Sort matching keys by frecency, then by length and name"""
+    now = time.time()
+    return sorted(matches, key=lambda key: (-frecency.frecency(scores, key, now), len(key), key))
+
+
+def _record_usage(key: str) -> None:
+    """Record the use of an alias. Failing to record it is not an error."""
+    try:
+        frecency.record(_get_usage_path(), key)
+    except OSError:
+        pass
 
 
 def cmd_repos_completion(args: Namespace) -> None:
-    """Print shell completion tokens for the `dotfiles repos` command"""
-    aliases = _get_repo_aliases(
+    """Print shell completion tokens for the `dotfiles repos` command
+
+    If a key is given, only the keys matching it are printed.
+    """
+    index = _load_repo_index(
         args.repos_path,
         args.file_path,
+        getattr(args, 'rebuild_index', False),
+        getattr(args, 'max_depth', 1),
     )
-    print(*aliases.keys(), sep=' ')
+    if args.key:
+        print(*_find_matches(index, args.key, frecency.load(_get_usage_path())), sep=' ')
+    else:
+        print(*index['aliases'].keys(), sep=' ')
+
+
+def _print_long_listing(aliases: dict) -> None:
+    """Print the aliases with their branch, HEAD and upstream, read from .git without running git"""
+    # Imported here so that the common paths don't pay for it
+    from dotfiles import gitinfo
+
+    rows = []
+    for key, path in aliases.items():
+        info = gitinfo.get_info(path) or {}
+        branch = info.get('branch') or ('(detached)' if info.get('head') else '-')
+        head = (info.get('head') or '-')[:7]
+        rows.append((key, branch, head, info.get('upstream') or '-', path))
+
+    key_length = max(len(row[0]) for row in rows)
+    branch_length = max(len(row[1]) for row in rows)
+    upstream_length = max(len(row[3]) for row in rows)
+    for key, branch, head, upstream, path in rows:
+        print(f'{key:{key_length}} {branch:{branch_length}} {head:7} {upstream:{upstream_length}} {path}')
+
+
+def _get_default_max_depth() -> int:
+    """Get the default repo discovery depth"""
+    try:
+        return int(os.environ.get('DOTFILES_REPOS_MAX_DEPTH', 1))
+    except ValueError:
+        return 1
+
+
+def add_alias_arguments(p: ArgumentParser) -> None:
+    """Add the arguments that locate the repo aliases to a parser or subparser"""
+    p.add_argument(
+        '--repos-path',
+        type=str,
+        default=home_path('repos'),
+        help='the directory where your git repositories are located'
+    )
+    p.add_argument(
+        '--file-path',
+        type=str,
+        default=home_path('.repo-aliases'),
+        help='repo aliases file path'
+    )
+    p.add_argument(
+        '--max-depth',
+        type=int,
+        default=_get_default_max_depth(),
+        help='how deep to look for git repositories in the repos directory, namespacing '
+             'nested repos as "dir/repo" (default: $DOTFILES_REPOS_MAX_DEPTH or 1)'
+    )
+    p.add_argument(
+        '--rebuild-index',
+        action='store_true',
+        default=False,
+        help='rebuild the cached alias index'
+    )
+
+
+def validate_alias_arguments(args: Namespace, command: str) -> None:
+    """Validate the arguments added by add_alias_arguments()"""
+    if not args.file_path:
+        raise ValidationError(command, 'Invalid repo aliases file path')
+    if not args.repos_path:
+        raise ValidationError(command, 'Invalid repos directory path')
+    if args.max_depth < 1:
+        raise ValidationError(command, 'Invalid max depth')
+
+
+def add_jobs_argument(p: ArgumentParser, default: int, action: str) -> None:
+    """Add the -j/--jobs argument of a command that works on every repo
+
+    Args:
+        p (ArgumentParser): The parser or subparser
+        default (int): The default number of jobs
+        action (str): What's done to the repos, for the help text (e.g. "check")
+    """
+    p.add_argument(
+        '-j',
+        '--jobs',
+        type=int,
+        default=default,
+        help=f'how many repos to {action} at once (default: {default})'
+    )
+
+
+def validate_jobs_argument(args: Namespace, command: str) -> None:
+    """Validate the argument added by add_jobs_argument()"""
+    if args.jobs < 1:
+        raise ValidationError(command, 'Invalid number of jobs')
+
+
+def get_repo_aliases(args: Namespace) -> dict:
+    """Get the repo aliases located by the arguments added by add_alias_arguments()"""
+    return _load_repo_aliases(args.repos_path, args.file_path, args.rebuild_index, args.max_depth)
+
+
+def get_git_repos(args: Namespace) -> Dict[str, str]:
+    """Get the repo aliases that point to git repos, for the commands that run git in every repo"""
+    return {key: path for key, path in get_repo_aliases(args).items() if is_git_repo(path)}
 
 
 def _configure_parser(p: ArgumentParser) -> None:
@@ -56,19 +560,22 @@ def _configure_parser(p: ArgumentParser) -> None:
         nargs='?',
         type=str,
         default=None,
-        help='get path by alias key'
+        help='get path by alias key (or the only key it is a prefix of)'
     )
+    add_alias_arguments(p)
     p.add_argument(
-        '--repos-path',
+        '--match',
         type=str,
-        default=home_path('repos'),
-        help='the directory where your git repositories are located'
+        default=None,
+        metavar='PREFIX',
+        help='list the keys matching a prefix (or fuzzily, if none do), best first'
     )
     p.add_argument(
-        '--file-path',
-        type=str,
-        default=home_path('.repo-aliases'),
-        help='repo aliases file path'
+        '-l',
+        '--long',
+        action='store_true',
+        default=False,
+        help='list the aliases with their current branch, HEAD and upstream'
     )
     p.add_argument(
         '--list-keys',
@@ -97,35 +604,70 @@ def add_parser(subparsers: _SubParsersAction) -> ArgumentParser:
         'repos',
         description='Repo aliases',
         help='repo aliases',
+        epilog='see also: dotfiles repos-status, dotfiles repos-sync',
     )
     _configure_parser(p)
     return p
 
 
+def _lookup_key(args: Namespace) -> Tuple[str, str]:
+    """Get the key and path of an exact key, or of the highest-ranked key it is a prefix of
+
+    Fuzzy matches are never jumped to, they're only offered by `--match`.
+
+    Returns:
+        tuple: The key and its repo path
+    """
+    path = _resolve_repo_alias(args.repos_path, args.file_path, args.key, args.max_depth)
+    if path is not None:
+        return args.key, path
+
+    index = _load_repo_index(args.repos_path, args.file_path, args.rebuild_index, args.max_depth)
+    matches = _find_prefix_matches(index, args.key)
+    if not matches:
+        sys.exit(console.FAILURE)
+    if len(matches) > 1:
+        matches = _rank_matches(matches, frecency.load(_get_usage_path()))
+
+    return matches[0], index['aliases'][matches[0]]
+
+
 def cmd_repos(args: Namespace) -> None:
     """Handle the `dotfiles repos` command"""
-    if not args.file_path:
-        raise ValidationError('repos', 'Invalid repo aliases file path')
-    if not args.repos_path:
-        raise ValidationError('repos', 'Invalid repos directory path')
-    if args.list_keys and args.list_paths:
-        raise ValidationError('repos', 'You can only use one of "--list-keys" or "--list-paths" options')
+    validate_alias_arguments(args, 'repos')
+    if sum([args.key is not None, args.match is not None, args.long, args.list_keys, args.list_paths]) > 1:
+        raise ValidationError(
+            'repos',
+            'You can only use one of a key, "--match", "--long", "--list-keys" or "--list-paths"'
+        )
     if not args.sep:
         raise ValidationError('repos', 'Invalid sep')
 
-    repo_aliases = _get_repo_aliases(args.repos_path, args.file_path)
+    if args.key is not None:
+        key, path = _lookup_key(args)
+        _record_usage(key)
+        print(path)
+        return
+
+    if args.match is not None:
+        index = _load_repo_index(args.repos_path, args.file_path, args.rebuild_index, args.max_depth)
+        matches = _find_matches(index, args.match, frecency.load(_get_usage_path()))
+        if not matches:
+            sys.exit(console.FAILURE)
+        print(*matches, sep=args.sep.encode().decode('unicode-escape'))
+        return
+
+    repo_aliases = get_repo_aliases(args)
 
     if not repo_aliases:
         sys.exit(console.SUCCESS)
 
-    if args.key is not None:
-        if args.key not in repo_aliases:
-            sys.exit(console.FAILURE)
-        print(repo_aliases.get(args.key, ''))
-    elif args.list_paths:
+    if args.list_paths:
         print(*repo_aliases.values(), sep=args.sep.encode().decode('unicode-escape'))
     elif args.list_keys:
         print(*repo_aliases.keys(), sep=args.sep.encode().decode('unicode-escape'))
+    elif args.long:
+        _print_long_listing(repo_aliases)
     else:
         length = max(len(x) for x in repo_aliases.keys())
         for key, path in repo_aliases.items():
@@ -0,0 +1,151 @@
+import json
+import os
+import sys
+from argparse import ArgumentParser, Namespace, _SubParsersAction
+
+from dotfiles import console, repos, run
+from dotfiles.errors import ValidationError
+
+_DEFAULT_JOBS = min(32, (os.cpu_count() or 1) * 4)
+_DEFAULT_TIMEOUT = 10.0
+
+
+def _parse_status(output: str) -> dict:
+    """Parse the output of `git status --porcelain=v2 --branch`"""
+    status = {
+        'branch': None,
+        'upstream': None,
+        'ahead': None,
+        'behind': None,
+        'changed': 0,
+        'untracked': 0,
+        'conflicted': 0,
+    }
+
+    for line in output.splitlines():
+        if line.startswith('# branch.head '):
+            head = line[len('# branch.head '):]
+            status['branch'] = None if head == '(detached)' else head
+        elif line.startswith('# branch.upstream '):
+            status['upstream'] = line[len('# branch.upstream '):]
+        elif line.startswith('# branch.ab '):
+            ahead, behind = line[len('# branch.ab '):].split(' ')
+            status['ahead'] = int(ahead)
+            status['behind'] = -int(behind)
+        elif line.startswith(('1 ', '2 ')):
+            status['changed'] += 1
+        elif line.startswith('u '):
+            status['conflicted'] += 1
+        elif line.startswith('? '):
+            status['untracked'] += 1
+
+    return status
+
+
+def _get_status(key: str, path: str, process: run.CompletedProcess) -> dict:
+    """Get the git status of a repo from its finished `git status` command"""
+    result = {'key': key, 'path': path, 'error': None}
+
+    if process.returncode == 0:
+        result.update(_parse_status(process.stdout.decode('utf-8', 'replace')))
+    else:
+        # A command that timed out or couldn't be started says so in its stderr
+        lines = process.stderr.decode('utf-8', 'replace').strip().splitlines()
+        result['error'] = lines[0] if lines else f"git exited with {process.returncode}"
+
+    return result
+
+
+def _format_status(status: dict, width: int) -> str:
+    """Format a repo's status as a table row"""
+    key = f"{status['key']:{width}}"
+
+    if status['error']:
+        return f"{key}  {console.colorize(status['error'], 'red')}"
+
+    branch = status['branch'] or '(detached)'
+    if not status['upstream']:
+        tracking = '-'
+    elif status['ahead'] is None:
+        # The upstream branch is configured but doesn't exist
+        tracking = 'gone'
+    elif status['ahead'] or status['behind']:
+        tracking = f"+{status['ahead']} -{status['behind']}"
+    else:
+        tracking = '='
+
+    changes = [
+        f"{status[name]} {name}" for name in ('conflicted', 'changed', 'untracked') if status[name]
+    ]
+    if changes:
+        state = console.colorize(', '.join(changes), 'yellow')
+    else:
+        state = console.colorize('clean', 'green')
+
+    return f"{key}  {branch:20} {tracking:9} {state}"
+
+
+def _configure_parser(p: ArgumentParser) -> None:
+    """Add repos-status arguments to a parser or subparser"""
+    repos.add_alias_arguments(p)
+    repos.add_jobs_argument(p, _DEFAULT_JOBS, 'check')
+    p.add_argument(
+        '--timeout',
+        type=float,
+        default=_DEFAULT_TIMEOUT,
+        help=f'seconds to wait for each repo (default: {_DEFAULT_TIMEOUT:g})'
+    )
+    p.add_argument(
+        '--json',
+        action='store_true',
+        default=False,
+        help='print one json object per repo'
+    )
+    p.set_defaults(handler=cmd_repos_status)
+
+
+def add_parser(subparsers: _SubParsersAction) -> ArgumentParser:
+    """Register the repos-status subcommand with a parent subparsers group"""
+    p = subparsers.add_parser(
+        'repos-status',
+        description='Show the git status of every repo',
+        help='show the git status of every repo',
+    )
+    _configure_parser(p)
+    return p
+
+
+def cmd_repos_status(args: Namespace) -> None:
+    """Handle the `dotfiles repos-status` command
+
+    Repos are checked concurrently (with `run.gather()`) and printed as soon
+    as they are done.
+    """
+    repos.validate_alias_arguments(args, 'repos_status')
+    repos.validate_jobs_argument(args, 'repos_status')
+    if args.timeout <= 0:
+        raise ValidationError('repos_status', 'Invalid timeout')
+
+    git_repos = repos.get_git_repos(args)
+    if not git_repos:
+        sys.exit(console.SUCCESS)
+
+    width = max(len(key) for key in git_repos)
+
+    def print_status(key: str, process: run.CompletedProcess) -> None:
+        status = _get_status(key, git_repos[key], process)
+        if args.json:
+            print(json.dumps(status), flush=True)
+        else:
+            print(_format_status(status, width), flush=True)
+
+    processes = run.gather(
+        {key: ['git', '-C', path, 'status', '--porcelain=v2', '--branch'] for key, path in git_repos.items()},
+        jobs=args.jobs,
+        capture_output=True,
+        timeout=args.timeout,
+        on_done=print_status,
+    )
+
+    if any(process.returncode != 0 for process in processes.values()):
+        sys.exit(console.FAILURE)
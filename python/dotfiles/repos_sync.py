@@ -0,0 +1,261 @@
+import os
+import re
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser, Namespace, _SubParsersAction
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, Iterator, List, Optional, Tuple
+
+from dotfiles import console, gitinfo
+from dotfiles.errors import ValidationError
+from dotfiles.repos import (
+    add_alias_arguments,
+    add_jobs_argument,
+    get_git_repos,
+    validate_alias_arguments,
+    validate_jobs_argument,
+)
+
+_DEFAULT_JOBS = 8
+_DEFAULT_PER_REMOTE = 4
+_DEFAULT_RETRIES = 2
+_DEFAULT_TIMEOUT = 120.0
+_SLOWEST_COUNT = 5
+
+# Never let git ask for credentials, it would hang the worker
+_GIT_ENV = {**os.environ, 'GIT_TERMINAL_PROMPT': '0'}
+
+
+def _git(path: str, *args: str, timeout: Optional[float] = None) -> Tuple[int, str]:
+    """Run a git command in a repo.
+
+    Returns:
+        tuple: The exit code, and the output, or the error message if it failed
+    """
+    try:
+        process = subprocess.run(
+            ['git', '-C', path, *args],
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            check=False,
+            env=_GIT_ENV,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        return 1, f"timed out after {timeout:g}s"
+    except OSError as ex:
+        return 1, str(ex)
+
+    if process.returncode == 0:
+        return 0, process.stdout.decode('utf-8', 'replace').strip()
+
+    lines = (process.stderr or process.stdout).decode('utf-8', 'replace').strip().splitlines()
+    errors = [line for line in lines if line.startswith(('fatal:', 'error:'))]
+    message = (errors or lines or [f"git exited with {process.returncode}"])[0]
+    return process.returncode, message
+
+
+def _get_remote_host(url: str) -> str:
+    """Get the host of a remote url, 'local' for paths and file:// urls"""
+    if url.lower().startswith('file://'):
+        return 'local'
+
+    match = re.match(r'^[a-z][a-z0-9+.-]*://(?:[^@/]*@)?([^/:]+)', url, re.IGNORECASE)
+    if match:
+        return match.group(1).lower()
+
+    # scp-like syntax: [user@]host:path
+    match = re.match(r'^(?:[^@/]*@)?([^/:]+):', url)
+    if match:
+        return match.group(1).lower()
+
+    return 'local'
+
+
+def _get_repo_host(path: str) -> str:
+    """Get the host of a repo's origin remote, read from its config without running git"""
+    git_dir = gitinfo.find_git_dir(path)
+    url = gitinfo.read_remote_url(git_dir) if git_dir is not None else None
+    return _get_remote_host(url) if url else 'local'
+
+
+def _get_skip_reason(path: str) -> Optional[str]:
+    """Get why a repo can't be fast-forwarded (detached HEAD, no upstream), None if it can"""
+    info = gitinfo.get_info(path)
+    if info is None:
+        return None
+    if info['branch'] is None:
+        return 'detached HEAD'
+    if info['upstream'] is None:
+        return f"no upstream for {info['branch']}"
+    return None
+
+
+def _sync_repo(key: str, path: str, host: str, args: Namespace) -> dict:
+    """Fetch (and optionally fast-forward) a repo, retrying failed fetches"""
+    result = {'key': key, 'path': path, 'host': host, 'error': None, 'skipped': None, 'attempts': 0}
+    start = time.monotonic()
+
+    for attempt in range(1, args.retries + 2):
+        result['attempts'] = attempt
+        code, message = _git(path, 'fetch', '--prune', timeout=args.timeout)
+        if code == 0:
+            break
+        if attempt <= args.retries:
+            time.sleep(attempt)
+
+    if code != 0:
+        result['error'] = f"fetch failed: {message}"
+    elif args.ff:
+        result['skipped'] = _get_skip_reason(path)
+        if result['skipped'] is None:
+            code, message = _git(path, 'merge', '--ff-only', '@{upstream}', timeout=args.timeout)
+            if code != 0:
+                result['error'] = f"fast-forward failed: {message}"
+
+    result['seconds'] = round(time.monotonic() - start, 3)
+    return result
+
+
+def _sync_repos(repos: Dict[str, str], args: Namespace) -> Iterator[dict]:
+    """Sync the repos concurrently, yielding each result as soon as it's done
+
+    At most `--jobs` repos are synced at once, and at most `--per-remote` of
+    them per remote host. Repos wait in a queue per host and are only handed
+    to the pool when their host has a free slot, so a busy host never ties up
+    workers that repos on other hosts could use.
+    """
+    queues: Dict[str, Deque[Tuple[str, str]]] = {}
+    for key, path in repos.items():
+        queues.setdefault(_get_repo_host(path), deque()).append((key, path))
+    running = {host: 0 for host in queues}
+    pending: Dict[Future, str] = {}
+    executor = ThreadPoolExecutor(max_workers=args.jobs)
+
+    def submit_ready() -> None:
+        # Round-robin over the hosts, so each of them gets its share of the pool
+        submitted = True
+        while submitted:
+            submitted = False
+            for host, queue in queues.items():
+                if queue and running[host] < args.per_remote and len(pending) < args.jobs:
+                    key, path = queue.popleft()
+                    pending[executor.submit(_sync_repo, key, path, host, args)] = host
+                    running[host] += 1
+                    submitted = True
+
+    try:
+        submit_ready()
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                running[pending.pop(future)] -= 1
+                yield future.result()
+            submit_ready()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _format_result(result: dict, width: int) -> str:
+    """Format a repo's sync result as a table row"""
+    if result['error']:
+        state = console.colorize(result['error'], 'red')
+    elif result['skipped']:
+        state = console.colorize(f"fetched, not fast-forwarded: {result['skipped']}", 'yellow')
+    else:
+        state = console.colorize('ok', 'green')
+    return f"{result['key']:{width}}  {result['seconds']:7.2f}s  {state}"
+
+
+def _print_summary(results: List[dict], seconds: float) -> None:
+    """Print the failures, the repos that weren't fast-forwarded and the slowest repos"""
+    failures = [result for result in results if result['error']]
+    skipped = [result for result in results if result['skipped']]
+
+    print()
+    print(f"Synced {len(results) - len(failures)}/{len(results)} repos in {seconds:.2f}s")
+    if skipped:
+        print(f"Not fast-forwarded: {', '.join(sorted(result['key'] for result in skipped))}")
+
+    slowest = sorted(results, key=lambda result: result['seconds'], reverse=True)[:_SLOWEST_COUNT]
+    print("Slowest:")
+    for result in slowest:
+        print(f"  {result['key']} {result['seconds']:.2f}s ({result['host']})")
+
+    if failures:
+        print(console.colorize(f"Failed ({len(failures)}):", 'red'))
+        for result in sorted(failures, key=lambda result: result['key']):
+            print(f"  {result['key']}: {result['error']} (attempts: {result['attempts']})")
+
+
+def _configure_parser(p: ArgumentParser) -> None:
+    """Add repos-sync arguments to a parser or subparser"""
+    add_alias_arguments(p)
+    p.add_argument(
+        '--ff',
+        action='store_true',
+        default=False,
+        help='fast-forward the current branch to its upstream after fetching'
+    )
+    add_jobs_argument(p, _DEFAULT_JOBS, 'sync')
+    p.add_argument(
+        '--per-remote',
+        type=int,
+        default=_DEFAULT_PER_REMOTE,
+        help=f'how many repos to sync at once per remote host (default: {_DEFAULT_PER_REMOTE})'
+    )
+    p.add_argument(
+        '--retries',
+        type=int,
+        default=_DEFAULT_RETRIES,
+        help=f'how many times to retry a failed fetch (default: {_DEFAULT_RETRIES})'
+    )
+    p.add_argument(
+        '--timeout',
+        type=float,
+        default=_DEFAULT_TIMEOUT,
+        help=f'seconds to wait for each git command (default: {_DEFAULT_TIMEOUT:g})'
+    )
+    p.set_defaults(handler=cmd_repos_sync)
+
+
+def add_parser(subparsers: _SubParsersAction) -> ArgumentParser:
+    """Register the repos-sync subcommand with a parent subparsers group"""
+    p = subparsers.add_parser(
+        'repos-sync',
+        description='Fetch (and optionally fast-forward) every repo',
+        help='fetch every repo',
+    )
+    _configure_parser(p)
+    return p
+
+
+def cmd_repos_sync(args: Namespace) -> None:
+    """Handle the `dotfiles repos-sync` command"""
+    validate_alias_arguments(args, 'repos_sync')
+    validate_jobs_argument(args, 'repos_sync')
+    if args.per_remote < 1:
+        raise ValidationError('repos_sync', 'Invalid number of jobs per remote')
+    if args.retries < 0:
+        raise ValidationError('repos_sync', 'Invalid number of retries')
+    if args.timeout <= 0:
+        raise ValidationError('repos_sync', 'Invalid timeout')
+
+    repos = get_git_repos(args)
+    if not repos:
+        sys.exit(console.SUCCESS)
+
+    width = max(len(key) for key in repos)
+    results = []
+    start = time.monotonic()
+
+    for result in _sync_repos(repos, args):
+        results.append(result)
+        print(_format_result(result, width), flush=True)
+
+    _print_summary(results, time.monotonic() - start)
+
+    if any(result['error'] for result in results):
+        sys.exit(console.FAILURE)
@@ -1,11 +1,145 @@
 import os
 import subprocess
 import sys
-from typing import Union
-from dotfiles import osinfo
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Sequence, TextIO, Tuple, Union
+from dotfiles import osinfo, tracing
 
 CompletedProcess = subprocess.CompletedProcess
-RunOutput = Union[CompletedProcess, str]
+
+_CHUNK_SIZE = 64 * 1024
+
+
+class StreamingProcess:
+    """A running command whose output is read while it's produced
+
+    Iterating yields stdout, as decoded lines (mode 'lines', line endings
+    kept) or raw byte chunks (mode 'bytes'). stderr is read alongside on a
+    thread. Both streams can be printed as they arrive (tee) and/or kept
+    (capture) at the same time. Once the iteration is done, `returncode`,
+    `stdout` and `stderr` are set.
+    """
+
+    def __init__(self, args: Union[str, List[str]], mode: Union[str, bool] = 'lines', **kwargs):
+        mode = 'lines' if mode is True else mode
+        if mode not in ('lines', 'bytes'):
+            raise ValueError(f"Invalid stream mode: {mode}")
+
+        self.args = args
+        self.mode = mode
+        self.returncode: Optional[int] = None
+        self._check = kwargs.get('check', True)
+        self._tee = kwargs.get('tee', False)
+        self._capture = kwargs.get('capture_output', False)
+        self._timeout = kwargs.get('timeout')
+        self._timed_out = False
+        self._stdout: List[bytes] = []
+        self._stderr: List[bytes] = []
+        self._output_bytes = 0
+        self._start = time.perf_counter()
+        # The process outlives __init__, it's waited for and its pipes are closed by __iter__
+        self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+            args,
+            shell=kwargs.get('shell', False),
+            executable=kwargs.get('executable'),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=kwargs.get('env', None),
+        )
+        # The timeout counts from the start of the command, not from when it's first read
+        self._timer: Optional[threading.Timer] = None
+        if self._timeout is not None:
+            self._timer = threading.Timer(self._timeout, self._kill)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @property
+    def stdout(self) -> Union[str, bytes, None]:
+        """The captured stdout (None unless capture_output)"""
+        return self._join(self._stdout) if self._capture else None
+
+    @property
+    def stderr(self) -> Union[str, bytes, None]:
+        """The captured stderr (None unless capture_output)"""
+        return self._join(self._stderr) if self._capture else None
+
+    def _join(self, chunks: List[bytes]) -> Union[str, bytes]:
+        data = b''.join(chunks)
+        return data if self.mode == 'bytes' else data.decode('utf-8', 'replace')
+
+    def _keep(self, data: bytes, chunks: List[bytes], file: TextIO) -> None:
+        """Capture and/or print a piece of output"""
+        self._output_bytes += len(data)
+        if self._capture:
+            chunks.append(data)
+        if self._tee:
+            if hasattr(file, 'buffer'):
+                file.flush()
+                file.buffer.write(data)
+            else:
+                file.write(data.decode('utf-8', 'replace'))
+            file.flush()
+
+    def _kill(self) -> None:
+        """Kill the command once it has run for too long"""
+        self._timed_out = True
+        self._process.kill()
+
+    def _read_stderr(self) -> None:
+        for data in iter(lambda: self._process.stderr.read1(_CHUNK_SIZE), b''):
+            self._keep(data, self._stderr, sys.stderr)
+
+    def _read_stdout(self) -> Iterator[bytes]:
+        if self.mode == 'bytes':
+            return iter(lambda: self._process.stdout.read1(_CHUNK_SIZE), b'')
+        return iter(self._process.stdout.readline, b'')
+
+    def __iter__(self) -> Iterator[Union[str, bytes]]:
+        stderr_reader = threading.Thread(target=self._read_stderr, daemon=True)
+        stderr_reader.start()
+
+        try:
+            for data in self._read_stdout():
+                self._keep(data, self._stdout, sys.stdout)
+                yield data if self.mode == 'bytes' else data.decode('utf-8', 'replace')
+        except BaseException:
+            # The caller stopped reading early (GeneratorExit) or failed to handle the output
+            self._process.kill()
+            raise
+        finally:
+            # After stdout's EOF the command may still be running (e.g. it closed stdout early),
+            # it's waited for, and only killed by the timeout
+            self.returncode = self._process.wait()
+            stderr_reader.join()
+            if self._timer is not None:
+                self._timer.cancel()
+            self._process.stdout.close()
+            self._process.stderr.close()
+            tracing.record(
+                self.args if isinstance(self.args, str) else ' '.join(self.args),
+                'run',
+                self._start,
+                time.perf_counter(),
+                argv=self.args,
+                returncode=self.returncode,
+                output_bytes=self._output_bytes,
+            )
+
+        if self._timed_out:
+            raise subprocess.TimeoutExpired(self.args, self._timeout, self.stdout, self.stderr)
+        if self._check and self.returncode != 0:
+            raise subprocess.CalledProcessError(self.returncode, self.args, self.stdout, self.stderr)
+
+
+RunOutput = Union[CompletedProcess, StreamingProcess, str]
+
+
+def _get_output_bytes(process: CompletedProcess) -> Optional[int]:
+    """Get how many bytes of output a process captured, None if it wasn't captured"""
+    if process.stdout is None and process.stderr is None:
+        return None
+    return len(process.stdout or b'') + len(process.stderr or b'')
 
 
 def command(cmd: str, *args, **kwargs) -> RunOutput:
@@ -23,6 +157,9 @@ def command(cmd: str, *args, **kwargs) -> RunOutput:
         capture_output (bool): Return output instead or printing it out
         env (dict): dictionary of env vars to run with the script
         timeout (int): timeout after n number of seconds
+        stream (bool|str): Return a StreamingProcess yielding the output as it's
+            produced, as 'lines' (or True) or 'bytes' chunks
+        tee (bool): Print the output while it's streamed
 
     Returns:
         RunOutput: The script's output
@@ -39,16 +176,25 @@ def command(cmd: str, *args, **kwargs) -> RunOutput:
     if kwargs.get('root', False):
         arguments.insert(0, 'sudo')
 
-    process = subprocess.run(
-        ' '.join(arguments),
-        check=kwargs.get('check', True),
-        shell=True,
-        executable=executable,
-        stdout=stdout,
-        capture_output=capture_output,
-        env=kwargs.get('env', None),
-        timeout=kwargs.get('timeout')
-    )
+    if kwargs.get('stream'):
+        return StreamingProcess(' '.join(arguments), kwargs['stream'], shell=True, executable=executable, **kwargs)
+
+    with tracing.span(' '.join(arguments), 'run', argv=arguments) as details:
+        process = subprocess.run(
+            ' '.join(arguments),
+            check=False,
+            shell=True,
+            executable=executable,
+            stdout=stdout,
+            capture_output=capture_output,
+            env=kwargs.get('env', None),
+            timeout=kwargs.get('timeout')
+        )
+        details['returncode'] = process.returncode
+        details['output_bytes'] = _get_output_bytes(process)
+
+    if kwargs.get('check', True):
+        process.check_returncode()
 
     if capture_output:
         output = process.stderr if process.returncode > 0 else process.stdout
@@ -72,7 +218,9 @@ def script(path: str, *args, **kwargs) -> RunOutput:
         capture_output (bool): Return output instead or printing it out.
         env (dict): dictionary of env vars to run with the script.
         timeout (int): timeout after n number of seconds.
-
+        stream (bool|str): Return a StreamingProcess yielding the output as it's
+            produced, as 'lines' (or True) or 'bytes' chunks.
+        tee (bool): Print the output while it's streamed.
 
     Returns:
         RunOutput: The script's output
@@ -91,17 +239,327 @@ def script(path: str, *args, **kwargs) -> RunOutput:
     if kwargs.get('root', False):
         arguments.insert(0, 'sudo')
 
-    process = subprocess.run(
-        arguments,
-        check=kwargs.get('check', True),
-        stdout=stdout,
-        capture_output=capture_output,
-        env=kwargs.get('env', None),
-        timeout=kwargs.get('timeout')
-    )
+    if kwargs.get('stream'):
+        return StreamingProcess(arguments, kwargs['stream'], **kwargs)
+
+    with tracing.span(' '.join(arguments), 'run', argv=arguments) as details:
+        process = subprocess.run(
+            arguments,
+            check=False,
+            stdout=stdout,
+            capture_output=capture_output,
+            env=kwargs.get('env', None),
+            timeout=kwargs.get('timeout')
+        )
+        details['returncode'] = process.returncode
+        details['output_bytes'] = _get_output_bytes(process)
+
+    if kwargs.get('check', True):
+        process.check_returncode()
 
     if capture_output:
         output = process.stderr if process.returncode > 0 else process.stdout
         return output.decode(sys.getdefaultencoding())
 
     return process
+
+
+class BackgroundProcess:
+    """A command running in the background with its output discarded
+
+    It runs in its own session, so Ctrl-C in the terminal doesn't reach it:
+    the caller decides whether to `wait()` for it or `cancel()` it.
+    """
+
+    def __init__(self, args: Sequence[str], **kwargs):
+        # Never prompt for a password from the background
+        self.args = ['sudo', '-n', *args] if kwargs.get('root', False) else list(args)
+        self._start = time.perf_counter()
+        self._recorded = False
+        # The process outlives __init__, it's reaped by wait() or cancel()
+        self._process = subprocess.Popen(  # pylint: disable=consider-using-with
+            self.args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            env=kwargs.get('env', None),
+            start_new_session=True,
+        )
+
+    @property
+    def running(self) -> bool:
+        """Whether the command hasn't finished yet"""
+        return self._process.poll() is None
+
+    def _record(self) -> None:
+        if not self._recorded:
+            self._recorded = True
+            tracing.record(
+                ' '.join(self.args),
+                'run',
+                self._start,
+                time.perf_counter(),
+                lane=self._process.pid,
+                argv=self.args,
+                returncode=self._process.returncode,
+            )
+
+    def wait(self, timeout: Optional[float] = None) -> int:
+        """Wait for the command to finish
+
+        Raises:
+            TimeoutExpired: The command is still running after the timeout
+        """
+        returncode = self._process.wait(timeout)
+        self._record()
+        return returncode
+
+    def cancel(self, timeout: float = 5.0) -> None:
+        """Stop the command, killing it if it doesn't stop within the timeout"""
+        if self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+                self._process.wait()
+        self._record()
+
+
+def background(args: Sequence[str], **kwargs) -> BackgroundProcess:
+    """Start a command in the background, without a shell
+
+    Args:
+        args (Sequence[str]): The command and its arguments
+        **kwargs: Keyword arguments.
+
+    Keyword Arguments:
+        root (bool): Run command as root (with `sudo -n`, so it fails instead of prompting)
+        env (dict): dictionary of env vars to run with the command
+
+    Returns:
+        BackgroundProcess: The running command
+    """
+    return BackgroundProcess(args, **kwargs)
+
+
+def validate_sudo() -> bool:
+    """Make sure sudo has cached credentials, asking for the password if it needs one
+
+    Background commands run with `sudo -n` and can't prompt, so this is called
+    before starting them.
+
+    Returns:
+        bool: Whether sudo can run commands without prompting now
+    """
+    with tracing.span('sudo -v', 'run', argv=['sudo', '-v']) as details:
+        try:
+            returncode = subprocess.run(['sudo', '-v'], check=False).returncode
+        except OSError:
+            returncode = 127
+        details['returncode'] = returncode
+    return returncode == 0
+
+
+def _echo(file: TextIO, label: str, line: bytes) -> None:
+    """Print a line of a command's output, prefixed with its label"""
+    file.write(f"{label}{line.decode('utf-8', 'replace')}\n")
+    file.flush()
+
+
+async def _pump(stream, chunks: List[bytes], file: Optional[TextIO], label: str) -> None:
+    """Read a command's output stream, keeping it and/or printing it line by line"""
+    pending = b''
+    while True:
+        data = await stream.read(64 * 1024)
+        if not data:
+            break
+        chunks.append(data)
+        if file is not None:
+            *lines, pending = (pending + data).split(b'\n')
+            for line in lines:
+                _echo(file, label, line)
+    if file is not None and pending:
+        _echo(file, label, pending)
+
+
+async def _communicate(
+    process,
+    output: Tuple[List[bytes], List[bytes]],
+    label: str,
+    echo: bool,
+    timeout: Optional[float],
+) -> None:
+    """Read a started command's output until it exits, killing it on a timeout or cancellation
+
+    The stdout and stderr chunks are kept in `output`, and printed as well with
+    echo. A timeout is noted at the end of stderr.
+    """
+    # Imported here so that the blocking helpers don't pay for asyncio
+    import asyncio
+
+    stdout, stderr = output
+    pumps = asyncio.gather(
+        _pump(process.stdout, stdout, sys.stdout if echo else None, label),
+        _pump(process.stderr, stderr, sys.stderr if echo else None, label),
+        process.wait(),
+    )
+
+    try:
+        await asyncio.wait_for(pumps, timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        stderr.append(f"timed out after {timeout:g}s\n".encode('utf-8'))
+    except asyncio.CancelledError:
+        process.kill()
+        await process.wait()
+        raise
+
+
+class _NullContext:
+    """Async context manager that does nothing, used when there's no semaphore"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *_):
+        return False
+
+
+async def command_async(args: Sequence[str], name: str = '', **kwargs) -> CompletedProcess:
+    """Run a command without a shell, asynchronously
+
+    Args:
+        args (Sequence[str]): The command and its arguments
+        name (str): The name output lines are prefixed with (default: the command)
+        **kwargs: Keyword arguments.
+
+    Keyword Arguments:
+        root (bool): Run command as root
+        capture_output (bool): Keep the output instead of printing it out
+        prefix (bool): Prefix printed lines with `[name] ` (default: True)
+        env (dict): dictionary of env vars to run with the command
+        timeout (float): kill the command after n number of seconds
+        semaphore (asyncio.Semaphore): Limits how many commands run at once
+
+    Returns:
+        CompletedProcess: The command's exit code, and its output when captured.
+            A command that timed out has been killed. A command that couldn't
+            be started (e.g. it isn't installed) has exit code 127.
+    """
+    # Imported here so that the blocking helpers don't pay for asyncio
+    import asyncio
+
+    arguments = ['sudo', *args] if kwargs.get('root', False) else list(args)
+    capture_output = kwargs.get('capture_output', False)
+    label = f"[{name or args[0]}] " if kwargs.get('prefix', True) else ''
+
+    async with kwargs.get('semaphore') or _NullContext():
+        start = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *arguments,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=kwargs.get('env', None),
+            )
+        except OSError as ex:
+            # Like a shell, a command that can't be started fails with 127 instead of stopping the others
+            error = f"{arguments[0]}: {ex.strerror or ex}".encode('utf-8')
+            if not capture_output:
+                _echo(sys.stderr, label, error)
+            return CompletedProcess(
+                arguments,
+                127,
+                b'' if capture_output else None,
+                error + b'\n' if capture_output else None,
+            )
+        stdout: List[bytes] = []
+        stderr: List[bytes] = []
+
+        try:
+            await _communicate(process, (stdout, stderr), label, not capture_output, kwargs.get('timeout'))
+        finally:
+            tracing.record(
+                ' '.join(arguments),
+                'run',
+                start,
+                time.perf_counter(),
+                lane=process.pid,
+                argv=arguments,
+                returncode=process.returncode,
+                output_bytes=sum(len(chunk) for chunk in (*stdout, *stderr)),
+            )
+
+    return CompletedProcess(
+        arguments,
+        process.returncode,
+        b''.join(stdout) if capture_output else None,
+        b''.join(stderr) if capture_output else None,
+    )
+
+
+async def gather_async(commands: Dict[str, Sequence[str]], **kwargs) -> Dict[str, CompletedProcess]:
+    """Run independent commands concurrently, asynchronously
+
+    Takes the same keyword arguments as `gather()`.
+    """
+    # Imported here so that the blocking helpers don't pay for asyncio
+    import asyncio
+
+    semaphore = asyncio.Semaphore(kwargs.pop('jobs', None) or os.cpu_count() or 4)
+    check = kwargs.pop('check', False)
+    on_done = kwargs.pop('on_done', None)
+    names = list(commands)
+
+    async def run_command(name: str) -> CompletedProcess:
+        process = await command_async(commands[name], name, semaphore=semaphore, **kwargs)
+        if on_done is not None:
+            on_done(name, process)
+        return process
+
+    results = await asyncio.gather(*[run_command(name) for name in names])
+    processes = dict(zip(names, results))
+
+    if check:
+        for process in processes.values():
+            process.check_returncode()
+
+    return processes
+
+
+def gather(commands: Dict[str, Sequence[str]], **kwargs) -> Dict[str, CompletedProcess]:
+    """Run independent commands concurrently and wait for all of them
+
+    Commands are run without a shell. A command failing, timing out or not
+    starting at all (exit code 127) doesn't stop the others. On Ctrl-C every
+    running command is killed and the KeyboardInterrupt is re-raised (`cli()`
+    exits with `console.CTRL_C`).
+
+    Args:
+        commands (dict): {name: [command, *arguments]}
+        **kwargs: Keyword arguments.
+
+    Keyword Arguments:
+        jobs (int): How many commands to run at once (default: the number of cpus)
+        root (bool): Run the commands as root
+        check (bool): Raise CalledProcessError for the first failed command once they are all done
+        capture_output (bool): Keep the output instead of printing it out
+        prefix (bool): Prefix printed lines with `[name] ` (default: True)
+        env (dict): dictionary of env vars to run the commands with
+        timeout (float): kill each command after n number of seconds
+        on_done (callable): Called with the name and CompletedProcess of each command as soon as
+            it's done, e.g. to print results without waiting for the slowest command
+
+    Returns:
+        dict: The CompletedProcess of each command, in the order they were given
+
+    Raises:
+        CalledProcessError: Command failure (with check)
+    """
+    # Imported here so that the blocking helpers don't pay for asyncio
+    import asyncio
+
+    return asyncio.run(gather_async(commands, **kwargs))
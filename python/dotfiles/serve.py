@@ -0,0 +1,196 @@
+import contextlib
+import io
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+from argparse import ArgumentParser, Namespace, _SubParsersAction
+from typing import List, Optional
+
+from dotfiles.errors import ValidationError
+
+# Only fast, read-only, non-interactive commands are answered by the server
+_SERVED_COMMANDS = ('--completion', 'osinfo', 'repos')
+_SOCKET_MODE = 0o700
+_MAX_REQUEST_SIZE = 64 * 1024
+# The server answers one connection at a time, a client that doesn't send its request is dropped
+_REQUEST_TIMEOUT = 2.0
+
+
+def socket_path() -> str:
+    """Get the per-user socket path of the `dotfiles serve` process"""
+    if os.environ.get('DOTFILES_SOCKET'):
+        return os.environ['DOTFILES_SOCKET']
+    if os.environ.get('XDG_RUNTIME_DIR'):
+        return os.path.join(os.environ['XDG_RUNTIME_DIR'], 'dotfiles.sock')
+    return os.path.join(os.sep, 'tmp', f"dotfiles-{os.getuid()}.sock")
+
+
+def _parse_request(data: bytes) -> List[str]:
+    """Parse a request line. Requests are the dotfiles arguments separated by tabs."""
+    line = data.decode('utf-8').rstrip('\r\n')
+    return [arg for arg in line.split('\t') if arg != ''] if line else []
+
+
+def _is_trusted_socket(path: str) -> bool:
+    """Check if a socket is owned by the current user and only accessible to them"""
+    try:
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return (
+        stat.S_ISSOCK(info.st_mode)
+        and info.st_uid == os.getuid()
+        and stat.S_IMODE(info.st_mode) == _SOCKET_MODE
+    )
+
+
+def _is_served(args: Namespace) -> bool:
+    """Check if a request is answered by the server.
+
+    Writing the osinfo snapshot and rebuilding the alias index are left to the
+    dotfiles process the client falls back to. `repos KEY` is served, its use
+    is recorded by the server (a locked append to the usage log).
+    """
+    if getattr(args, 'rebuild_index', False):
+        return False
+    if args.completion:
+        return True
+    if args.command == 'osinfo':
+        return args.snapshot is None and not args.env
+    return args.command == 'repos'
+
+
+def _clear_caches() -> None:
+    """Forget what the previous requests cached, the OS facts may have changed since"""
+    osinfo = sys.modules.get('dotfiles.osinfo')
+    if osinfo is not None:
+        osinfo.clear_cache()
+
+
+def _answer(parser: ArgumentParser, argv: List[str]) -> Optional[str]:
+    """Run a served command in-process.
+
+    Returns:
+        str|None: The exit status line followed by what the command printed,
+                  None if the request isn't served
+    """
+    if not argv or argv[0] not in _SERVED_COMMANDS:
+        return None
+
+    _clear_caches()
+    output = io.StringIO()
+    status = 0
+
+    with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+        try:
+            args = parser.parse_args(argv)
+            if not _is_served(args):
+                return None
+            if args.completion:
+                # noinspection PyProtectedMember
+                from dotfiles.main import _handle_completion
+                _handle_completion(args)
+            elif getattr(args, 'handler', None) is not None:
+                args.handler(args)
+        except SystemExit as ex:
+            status = ex.code if isinstance(ex.code, int) else (0 if ex.code is None else 1)
+        except ValidationError:
+            status = 1
+
+    return f"{status}\n{output.getvalue()}"
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Answer one request per connection"""
+
+    timeout = _REQUEST_TIMEOUT
+
+    def handle(self) -> None:
+        try:
+            argv = _parse_request(self.rfile.readline(_MAX_REQUEST_SIZE))
+        except OSError:
+            # Timed out waiting for the request
+            return
+        response = _answer(self.server.parser, argv)
+        # An empty response tells the client to run dotfiles itself
+        if response is not None:
+            self.wfile.write(response.encode('utf-8'))
+
+
+class _Server(socketserver.UnixStreamServer):
+    """Unix socket server that keeps a prebuilt argument parser around"""
+
+    def __init__(self, path: str, parser: ArgumentParser):
+        self.parser = parser
+        super().__init__(path, _RequestHandler)
+
+
+def _is_listening(path: str) -> bool:
+    """Check if a server is already accepting connections on the socket"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+def _configure_parser(p: ArgumentParser) -> None:
+    """Add serve arguments to a parser or subparser"""
+    p.add_argument(
+        '--socket',
+        type=str,
+        default=None,
+        help='the unix socket path (default: $XDG_RUNTIME_DIR/dotfiles.sock)'
+    )
+    p.set_defaults(handler=cmd_serve)
+
+
+def add_parser(subparsers: _SubParsersAction) -> ArgumentParser:
+    """Register the serve subcommand with a parent subparsers group"""
+    p = subparsers.add_parser(
+        'serve',
+        description='Answer completion, repos and osinfo queries from a long-lived process',
+        help='run the completion/lookup server',
+    )
+    _configure_parser(p)
+    return p
+
+
+def cmd_serve(args: Namespace) -> None:
+    """Handle the `dotfiles serve` command"""
+    # noinspection PyProtectedMember
+    from dotfiles.main import _build_parser
+
+    path = args.socket or socket_path()
+
+    if os.path.lexists(path):
+        if not _is_trusted_socket(path):
+            raise ValidationError('serve', f"{path} isn't a socket owned by you with mode 0700")
+        if _is_listening(path):
+            raise ValidationError('serve', f"A server is already listening on {path}")
+        os.remove(path)
+
+    old_umask = os.umask(0o077)
+    try:
+        server = _Server(path, _build_parser())
+    finally:
+        os.umask(old_umask)
+
+    if not _is_trusted_socket(path):
+        server.server_close()
+        raise ValidationError('serve', f"{path} isn't a socket owned by you with mode 0700")
+
+    # Make sure the socket is cleaned up when we are stopped
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Listening on {path}", file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        with contextlib.suppress(OSError):
+            os.remove(path)
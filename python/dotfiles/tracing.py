@@ -0,0 +1,161 @@
+import atexit
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from dotfiles.paths import cache_path
+
+ENV_VAR = 'DOTFILES_TRACE'
+
+# When tracing was imported, as close to the start of the process as we can get
+START = time.perf_counter()
+
+_SUMMARY_COUNT = 20
+
+
+class _Trace:
+    """The events recorded so far (None while tracing is off) and where they are written"""
+
+    def __init__(self):
+        self.events: Optional[List[dict]] = None
+        self.output_path: Optional[str] = None
+        self.lock = threading.Lock()
+
+
+_trace = _Trace()
+
+
+def default_path() -> str:
+    """Get the default trace file path"""
+    return cache_path('trace.json')
+
+
+def enabled() -> bool:
+    """Check if events are being recorded"""
+    return _trace.events is not None
+
+
+def enable(path: Optional[str] = None) -> None:
+    """Start recording events, the trace is written when the process exits
+
+    Args:
+        path (str): The Chrome trace (json) file path (default: ~/.cache/dotfiles/trace.json)
+    """
+    if _trace.events is not None:
+        return
+
+    _trace.events = []
+    _trace.output_path = path or default_path()
+    atexit.register(_write)
+
+
+def configure(argv: List[str]) -> List[str]:
+    """Enable tracing if `--profile` or `--profile-output FILE` is in the arguments, or $DOTFILES_TRACE is set
+
+    $DOTFILES_TRACE is either a trace file path or 1.
+
+    Returns:
+        list: The arguments without `--profile` and `--profile-output FILE`
+    """
+    value = os.environ.get(ENV_VAR, '')
+    trace = value not in ('', '0')
+    path = None if value in ('', '0', '1') else value
+    remaining = []
+    args = iter(argv)
+
+    for arg in args:
+        if arg == '--':
+            remaining.extend([arg, *args])
+            break
+        if arg == '--profile':
+            trace = True
+        elif arg == '--profile-output':
+            trace = True
+            path = next(args, None) or path
+        elif arg.startswith('--profile-output='):
+            trace = True
+            path = arg.partition('=')[2] or path
+        else:
+            remaining.append(arg)
+
+    if trace:
+        enable(path)
+
+    return remaining
+
+
+def record(name: str, category: str, start: float, end: float, lane: Optional[int] = None, **args) -> None:
+    """Record a completed event
+
+    Args:
+        name (str): What happened (e.g. the command that was run)
+        category (str): The kind of event (cli, run)
+        start (float): When it started (time.perf_counter())
+        end (float): When it ended (time.perf_counter())
+        lane (int): The timeline it's drawn on (default: the current thread)
+        **args: Details shown with the event
+    """
+    if _trace.events is None:
+        return
+
+    event = {
+        'name': name,
+        'cat': category,
+        'ph': 'X',
+        'ts': round((start - START) * 1e6, 1),
+        'dur': round((end - start) * 1e6, 1),
+        'pid': os.getpid(),
+        'tid': threading.get_ident() if lane is None else lane,
+        'args': args,
+    }
+    with _trace.lock:
+        _trace.events.append(event)
+
+
+@contextmanager
+def span(name: str, category: str = 'cli', **args) -> Iterator[dict]:
+    """Record how long a block takes. The yielded dict's items are added to the event's details."""
+    if _trace.events is None:
+        yield args
+        return
+
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        record(name, category, start, time.perf_counter(), **args)
+
+
+def _format_summary(events: List[dict]) -> List[str]:
+    """Format the slowest events as text lines"""
+    lines = []
+    for event in sorted(events, key=lambda event: event['dur'], reverse=True)[:_SUMMARY_COUNT]:
+        details = ''
+        if 'returncode' in event['args']:
+            details = f" (exit {event['args']['returncode']})"
+        lines.append(f"{event['dur'] / 1000:10.1f} ms  {event['cat']:7} {event['name']}{details}")
+    return lines
+
+
+def _write() -> None:
+    """Write the Chrome trace file and print a summary of the slowest events"""
+    # Imported here so that tracing costs nothing when it's off
+    import json
+
+    with _trace.lock:
+        events = list(_trace.events or [])
+
+    try:
+        os.makedirs(os.path.dirname(os.path.abspath(_trace.output_path)), exist_ok=True)
+        with open(_trace.output_path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, file)
+    except OSError as ex:
+        print(f"Failed to write the trace: {ex}", file=sys.stderr)
+    else:
+        print(f"Trace written to {_trace.output_path}", file=sys.stderr)
+
+    for line in _format_summary(events):
+        print(line, file=sys.stderr)
@@ -1,10 +1,13 @@
+import os
 import shutil
 from collections import OrderedDict
-from typing import Union, Any
-from dotfiles import run
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 ArrType = Union[list, tuple]
 
+# {PATH: (the mtimes of its directories, {name: [candidate paths in PATH order]})}
+_path_indexes: Dict[str, Tuple[Tuple[int, ...], Dict[str, List[str]]]] = {}
+
 
 def array_exclude(items: ArrType, exclude_: ArrType) -> ArrType:
     """Exclude items from a list or tuple"""
@@ -37,6 +40,119 @@ def installed(program: str) -> bool:
     return is_cmd_installed(program) or is_pkg_installed(program)
 
 
+def installed_many(programs: Iterable[str]) -> Dict[str, bool]:
+    """Checks if each of the programs is installed, reading the dpkg database only once
+
+    :param programs: The program names to check
+    :return: Whether or not each program is installed
+    :rtype: dict
+    """
+    # Imported here so that importing utils doesn't parse the dpkg database
+    from dotfiles import dpkg
+    programs = list(programs)
+    commands = which_many(programs)
+    packages = dpkg.installed_many(program for program in programs if commands[program] is None)
+    return {program: commands[program] is not None or packages[program] for program in programs}
+
+
+def read_json_cache(path: str) -> Any:
+    """Reads a json cache file
+
+    :param str path: The cache file path
+    :return: The cached data, None if the file is missing or isn't valid json
+    """
+    # Imported here so that importing utils doesn't import json
+    import json
+    try:
+        with open(path, 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_cache(path: str, data: Any) -> None:
+    """Writes a json cache file atomically, creating its directory.
+    Failing to write a cache is not an error, it's just rebuilt the next time.
+
+    :param str path: The cache file path
+    :param data: What to cache
+    """
+    # Imported here so that importing utils doesn't import json
+    import json
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, separators=(',', ':'))
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def _get_mtime(directory: str) -> int:
+    """Get the mtime of a directory, -1 if it doesn't exist"""
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return -1
+
+
+def _get_path_index() -> Dict[str, List[str]]:
+    """Get the names of every file in the PATH directories.
+
+    Each directory is scanned once, and scanned again only when PATH or one of
+    the directories' mtimes changes.
+    """
+    path_env = os.environ.get('PATH', os.defpath)
+    directories = array_unique([directory for directory in path_env.split(os.pathsep) if directory])
+    mtimes = tuple(_get_mtime(directory) for directory in directories)
+
+    cached = _path_indexes.get(path_env)
+    if cached is not None and cached[0] == mtimes:
+        return cached[1]
+
+    index: Dict[str, List[str]] = {}
+    for directory in directories:
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    index.setdefault(entry.name, []).append(entry.path)
+        except OSError:
+            continue
+
+    # Only the index of the current PATH is kept
+    _path_indexes.clear()
+    _path_indexes[path_env] = (mtimes, index)
+    return index
+
+
+def _is_executable(path: str) -> bool:
+    """Checks to see if a path is an executable file"""
+    return os.path.isfile(path) and os.access(path, os.X_OK)
+
+
+def which_many(programs: Iterable[str]) -> Dict[str, Optional[str]]:
+    """Finds the path of each of the commands, like `shutil.which()` but with one PATH scan.
+    Use is_cmd_installed() to look up a single command.
+
+    :param programs: The command names to look up
+    :return: The path of each command, None for the ones that aren't on the PATH
+    :rtype: dict
+    """
+    index = _get_path_index()
+    paths = {}
+    for program in programs:
+        if os.path.dirname(program):
+            paths[program] = program if _is_executable(program) else None
+        else:
+            candidates = index.get(program, ())
+            paths[program] = next((path for path in candidates if _is_executable(path)), None)
+    return paths
+
+
 def is_cmd_installed(program: str) -> bool:
     """Checks to see if a command is installed"""
     return shutil.which(program) is not None
@@ -44,5 +160,6 @@ def is_cmd_installed(program: str) -> bool:
 
 def is_pkg_installed(program: str) -> bool:
     """Checks to see if a package is installed via dpkg"""
-    proc = run.command(f"dpkg -l | grep -E '^ii' | grep -iwq '{program}'", check=False)
-    return proc.returncode == 0
+    # Imported here so that importing utils doesn't parse the dpkg database
+    from dotfiles import dpkg
+    return dpkg.is_installed(program)
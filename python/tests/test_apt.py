@@ -0,0 +1,159 @@
+import gzip
+import lzma
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from dotfiles import apt
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+APT_ROOT = os.path.join(FIXTURES_DIR, 'apt-root')
+LISTS_DIR = os.path.join(FIXTURES_DIR, 'apt-lists')
+
+PHP_PACKAGES = {'8.2': ['cli', 'mbstring'], '8.3': ['cli', 'mbstring']}
+
+
+class PhpPackagesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.lists_dir = os.path.join(self.directory, 'lists')
+        shutil.copytree(LISTS_DIR, self.lists_dir)
+
+        patch = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.directory, 'cache')})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _compress(self, name, open_, suffix):
+        """Replace a package list with its compressed version"""
+        path = os.path.join(self.lists_dir, name)
+        with open(path, 'rb') as source, open_(path + suffix, 'wb') as target:
+            target.write(source.read())
+        os.remove(path)
+
+    def test_reads_the_package_lines(self):
+        self.assertEqual(apt.php_packages(self.lists_dir, use_cache=False), PHP_PACKAGES)
+        self.assertEqual(apt.available_php_versions(self.lists_dir, use_cache=False), ['8.3', '8.2'])
+
+    def test_compressed_lists(self):
+        names = sorted(name for name in os.listdir(self.lists_dir) if name.endswith('_Packages'))
+        self._compress(names[0], gzip.open, '.gz')
+        self._compress(names[1], lzma.open, '.xz')
+        self.assertEqual(apt.php_packages(self.lists_dir, use_cache=False), PHP_PACKAGES)
+
+    def test_unreadable_lists_are_left_to_apt_cache(self):
+        for name in os.listdir(self.lists_dir):
+            if name.endswith('_Packages'):
+                os.rename(os.path.join(self.lists_dir, name), os.path.join(self.lists_dir, name + '.lz4'))
+        output = subprocess.CompletedProcess([], 0, b'php8.1\nphp8.1-cli\nphp-common\nphp8.1-fpm\n', b'')
+        with mock.patch.object(apt.subprocess, 'run', return_value=output) as run:
+            self.assertEqual(apt.php_packages(self.lists_dir, use_cache=False), {'8.1': ['cli', 'fpm']})
+        self.assertEqual(run.call_args[0][0], ['apt-cache', 'pkgnames', 'php'])
+
+    def test_missing_lists(self):
+        self.assertEqual(apt.php_packages(os.path.join(self.directory, 'missing'), use_cache=False), {})
+
+    def test_index_is_used_until_a_list_changes(self):
+        self.assertEqual(apt.php_packages(self.lists_dir), PHP_PACKAGES)
+        with mock.patch.object(apt, '_scan_php_packages', side_effect=AssertionError('scanned')):
+            self.assertEqual(apt.php_packages(self.lists_dir), PHP_PACKAGES)
+
+        path = os.path.join(self.lists_dir, 'packages.sury.org_php_dists_bookworm_main_binary-amd64_Packages')
+        with open(path, 'a', encoding='utf-8') as file:
+            file.write('\nPackage: php8.4-cli\nVersion: 8.4.0-1\n')
+        self.assertEqual(apt.php_packages(self.lists_dir)['8.4'], ['cli'])
+
+
+class SourcesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sources = apt.get_sources(APT_ROOT)
+
+    def test_reads_every_sources_file(self):
+        self.assertEqual(
+            [(os.path.basename(source.path), source.uris) for source in self.sources],
+            [
+                ('sources.list', ('http://deb.debian.org/debian',)),
+                ('sources.list', ('http://deb.debian.org/debian',)),
+                ('debian.sources', ('http://deb.debian.org/debian-security',)),
+                ('debian.sources', ('https://packages.sury.org/php/',)),
+                ('docker.sources', ('https://download.docker.com/linux/debian',)),
+                ('php.list', ('https://packages.sury.org/php/',)),
+            ],
+        )
+
+    def test_one_line_sources(self):
+        deb, deb_src = self.sources[:2]
+        self.assertEqual(deb.types, ('deb',))
+        self.assertEqual(deb.suites, ('bookworm',))
+        self.assertEqual(deb.components, ('main', 'contrib'))
+        self.assertEqual(deb_src.types, ('deb-src',))
+
+        php = self.sources[-1]
+        self.assertEqual(php.signed_by, '/etc/apt/keyrings/php.gpg')
+        self.assertEqual(php.components, ('main',))
+        self.assertTrue(php.enabled)
+
+    def test_deb822_sources(self):
+        security, disabled, docker = self.sources[2:5]
+        self.assertEqual(security.signed_by, '/usr/share/keyrings/debian-archive-keyring.gpg')
+        self.assertTrue(security.enabled)
+        self.assertEqual(disabled.types, ('deb', 'deb-src'))
+        self.assertFalse(disabled.enabled)
+        self.assertEqual(docker.signed_by, 'inline')
+
+    def test_has_source(self):
+        self.assertTrue(apt.has_source(r'packages\.sury\.org/php', APT_ROOT))
+        self.assertFalse(apt.has_source(r'ppa\.launchpadcontent\.net', APT_ROOT))
+
+    def test_commented_and_disabled_sources_dont_count(self):
+        root = tempfile.mkdtemp()
+        try:
+            shutil.copytree(APT_ROOT, root, dirs_exist_ok=True)
+            os.remove(os.path.join(root, 'etc', 'apt', 'sources.list.d', 'php.list'))
+            self.assertFalse(apt.has_source(r'packages\.sury\.org/php', root))
+        finally:
+            shutil.rmtree(root, ignore_errors=True)
+
+    def test_missing_root(self):
+        self.assertEqual(apt.get_sources(os.path.join(FIXTURES_DIR, 'missing')), [])
+
+
+class ListsAgeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.stamp_path = os.path.join(self.directory, 'update-success-stamp')
+        self.partial_path = os.path.join(self.directory, 'partial')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _touch(self, path, age):
+        with open(path, 'w', encoding='utf-8'):
+            pass
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+
+    def test_prefers_the_success_stamp(self):
+        self._touch(self.stamp_path, 7200)
+        self._touch(self.partial_path, 60)
+        self.assertAlmostEqual(apt.lists_age((self.stamp_path, self.partial_path)), 7200, delta=5)
+
+    def test_falls_back_to_the_download_directory(self):
+        self._touch(self.partial_path, 60)
+        self.assertAlmostEqual(apt.lists_age((self.stamp_path, self.partial_path)), 60, delta=5)
+
+    def test_never_updated(self):
+        self.assertIsNone(apt.lists_age((self.stamp_path, self.partial_path)))
+
+
+if __name__ == '__main__':
+    unittest.main()
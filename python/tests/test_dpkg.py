@@ -0,0 +1,86 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from dotfiles import dpkg
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'dpkg-status')
+
+
+class StatusDatabaseTest(unittest.TestCase):
+
+    def setUp(self):
+        self.database = dpkg.load(FIXTURE_PATH)
+
+    def test_parses_every_package(self):
+        self.assertEqual(
+            [package.name for package in self.database],
+            ['bash', 'libssl3', 'php8.1', 'php8.1-cli', 'php8.10-cli', 'php8.3-common', 'vim'],
+        )
+
+    def test_skips_multi_line_fields(self):
+        bash = self.database.get('bash')
+        self.assertEqual(bash.version, '5.2.15-2+b7')
+        self.assertEqual(bash.architecture, 'amd64')
+        self.assertIsNone(self.database.get('not-a-package'))
+
+    def test_states(self):
+        self.assertTrue(self.database.is_installed('vim'))
+        self.assertTrue(self.database.is_installed('VIM'))
+        self.assertFalse(self.database.is_installed('php8.3-common'))
+        self.assertEqual(self.database.get('php8.3-common').state, 'config-files')
+        self.assertFalse(self.database.is_installed('nano'))
+
+    def test_keeps_the_installed_architecture(self):
+        libssl = self.database.get('libssl3')
+        self.assertTrue(libssl.installed)
+        self.assertEqual(libssl.architecture, 'amd64')
+
+    def test_installed_many(self):
+        self.assertEqual(
+            dpkg.installed_many(['bash', 'php8.3-common', 'nano'], FIXTURE_PATH),
+            {'bash': True, 'php8.3-common': False, 'nano': False},
+        )
+
+    def test_with_prefix(self):
+        self.assertEqual(
+            [package.name for package in self.database.with_prefix('php8.1')],
+            ['php8.1', 'php8.1-cli', 'php8.10-cli'],
+        )
+        self.assertEqual(self.database.with_prefix('zsh'), [])
+
+    def test_matching(self):
+        self.assertEqual(
+            [package.name for package in self.database.matching(r'^php\d+\.\d+-')],
+            ['php8.1-cli', 'php8.10-cli', 'php8.3-common'],
+        )
+
+
+class LoadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'status')
+        shutil.copyfile(FIXTURE_PATH, self.path)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_missing_file_is_empty(self):
+        self.assertEqual(len(dpkg.load(os.path.join(self.directory, 'missing'))), 0)
+
+    def test_cached_until_the_file_changes(self):
+        database = dpkg.load(self.path)
+        self.assertIs(dpkg.load(self.path), database)
+
+        with open(self.path, 'a', encoding='utf-8') as file:
+            file.write('\nPackage: zsh\nStatus: install ok installed\nVersion: 5.9-4\n')
+
+        reloaded = dpkg.load(self.path)
+        self.assertIsNot(reloaded, database)
+        self.assertTrue(reloaded.is_installed('zsh'))
+
+
+if __name__ == '__main__':
+    unittest.main()
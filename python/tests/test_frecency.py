@@ -0,0 +1,61 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from dotfiles import frecency
+
+
+class FrecencyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'usage', 'repos')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_records_are_replayed(self):
+        frecency.record(self.path, 'api', now=100)
+        frecency.record(self.path, 'api', now=200)
+        frecency.record(self.path, 'docs', now=150)
+        self.assertEqual(frecency.load(self.path), {'api': [2.0, 200], 'docs': [1.0, 150]})
+
+    def test_torn_last_record_is_ignored(self):
+        frecency.record(self.path, 'api', now=100)
+        with open(f"{self.path}.log", 'ab') as file:
+            file.write(frecency._RECORD_HEADER.pack(200, 8) + b'doc')
+        self.assertEqual(frecency.load(self.path), {'api': [1.0, 100]})
+
+    def test_compact_keeps_the_scores(self):
+        frecency.record(self.path, 'api', now=100)
+        frecency.record(self.path, 'api', now=200)
+        frecency.compact(self.path)
+        self.assertEqual(os.path.getsize(f"{self.path}.log"), 0)
+
+        frecency.record(self.path, 'api', now=300)
+        self.assertEqual(frecency.load(self.path), {'api': [3.0, 300]})
+
+    def test_big_log_is_compacted(self):
+        with mock.patch.object(frecency, '_COMPACT_SIZE', 32):
+            for _ in range(5):
+                frecency.record(self.path, 'dotfiles', now=100)
+        self.assertLess(os.path.getsize(f"{self.path}.log"), 32)
+        self.assertEqual(frecency.load(self.path), {'dotfiles': [5.0, 100]})
+
+    def test_aging_forgets_rarely_used_keys(self):
+        with mock.patch.object(frecency, '_MAX_TOTAL_RANK', 10.0):
+            scores = frecency._age({'api': [19.0, 100], 'docs': [1.0, 100]})
+        self.assertEqual(list(scores), ['api'])
+        self.assertAlmostEqual(scores['api'][0], 19.0 * 0.9 * 10.0 / 20.0)
+
+    def test_recent_use_weighs_more(self):
+        scores = {'api': [4.0, 1000], 'docs': [4.0, 1000 - 2 * 86400]}
+        self.assertEqual(frecency.frecency(scores, 'api', now=1000), 16.0)
+        self.assertEqual(frecency.frecency(scores, 'docs', now=1000), 2.0)
+        self.assertEqual(frecency.frecency(scores, 'web', now=1000), 0.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
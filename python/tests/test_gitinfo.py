@@ -0,0 +1,76 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+from dotfiles import gitinfo
+
+
+def _git(cwd, *args):
+    """Run git in a directory, returns its output"""
+    return subprocess.run(
+        ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', '-c', 'init.defaultBranch=main', *args],
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+
+class GitInfoTest(unittest.TestCase):
+    """gitinfo's answers compared with git's own"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.remote_path = os.path.join(self.directory, 'remote.git')
+        self.repo_path = os.path.join(self.directory, 'repo')
+
+        _git(self.directory, 'init', '--bare', self.remote_path)
+        _git(self.directory, 'clone', self.remote_path, self.repo_path)
+        _git(self.repo_path, 'commit', '--allow-empty', '-m', 'first')
+        _git(self.repo_path, 'push', '-u', 'origin', 'main')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_branch_head_and_upstream(self):
+        self.assertEqual(gitinfo.get_info(self.repo_path), {
+            'branch': 'main',
+            'head': _git(self.repo_path, 'rev-parse', 'HEAD'),
+            'upstream': 'origin/main',
+        })
+
+    def test_packed_refs(self):
+        _git(self.repo_path, 'pack-refs', '--all')
+        self.assertFalse(os.path.exists(os.path.join(self.repo_path, '.git', 'refs', 'heads', 'main')))
+        self.assertEqual(gitinfo.get_info(self.repo_path)['head'], _git(self.repo_path, 'rev-parse', 'HEAD'))
+
+    def test_detached_head(self):
+        _git(self.repo_path, 'checkout', '--detach')
+        info = gitinfo.get_info(self.repo_path)
+        self.assertIsNone(info['branch'])
+        self.assertIsNone(info['upstream'])
+        self.assertEqual(info['head'], _git(self.repo_path, 'rev-parse', 'HEAD'))
+
+    def test_worktree(self):
+        worktree_path = os.path.join(self.directory, 'worktree')
+        _git(self.repo_path, 'worktree', 'add', '-b', 'feature', worktree_path)
+        self.assertEqual(gitinfo.get_info(worktree_path), {
+            'branch': 'feature',
+            'head': _git(worktree_path, 'rev-parse', 'HEAD'),
+            'upstream': None,
+        })
+
+    def test_remote_url(self):
+        git_dir = gitinfo.find_git_dir(self.repo_path)
+        self.assertEqual(gitinfo.read_remote_url(git_dir), self.remote_path)
+        self.assertIsNone(gitinfo.read_remote_url(git_dir, 'upstream'))
+
+    def test_not_a_repo(self):
+        self.assertIsNone(gitinfo.get_info(self.directory))
+
+
+if __name__ == '__main__':
+    unittest.main()
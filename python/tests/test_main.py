@@ -0,0 +1,63 @@
+import unittest
+from unittest import mock
+
+from dotfiles import console, main
+
+
+class SelectedPathTest(unittest.TestCase):
+
+    def _get_selected_path(self, argv):
+        return main._get_selected_path(main._build_parser([]), argv)
+
+    def test_group_command(self):
+        self.assertEqual(self._get_selected_path(['install', 'php', '8.3']), ('install', 'php'))
+
+    def test_top_level_option_values_are_skipped(self):
+        argv = ['--answer', 'install_php.env=server', '--answers-file', 'answers', 'install', 'php']
+        self.assertEqual(self._get_selected_path(argv), ('install', 'php'))
+
+    def test_abbreviated_options_are_rejected(self):
+        argv = ['--answers', 'answers', 'install', 'php']
+        with self.assertRaises(SystemExit), mock.patch('sys.stderr'):
+            main._build_parser(argv).parse_args(argv)
+        with self.assertRaises(SystemExit), mock.patch('sys.stderr'):
+            main._build_parser(['repos']).parse_args(['repos', '--repos', 'code'])
+
+    def test_command_arguments_are_not_selected(self):
+        self.assertEqual(self._get_selected_path(['repos', '--repos-path', 'code']), ('repos',))
+        self.assertEqual(self._get_selected_path(['repos', 'dotfiles']), ('repos',))
+
+
+class AnswerOptionsTest(unittest.TestCase):
+
+    def tearDown(self):
+        console.preseed()
+
+    def _parse(self, argv):
+        return main._build_parser(argv).parse_args(argv)
+
+    def test_after_the_command(self):
+        args = self._parse(['install', 'php', '8.3', '-y', '--answer', 'install_php.env=server'])
+        main._preseed_answers(args)
+        self.assertTrue(args.yes)
+        self.assertEqual(console._preseed.answers, {'install_php.env': 'server'})
+
+    def test_before_and_after_the_command_are_merged(self):
+        args = self._parse([
+            '-y',
+            '--answer', 'install_php.env=server',
+            'install', 'php',
+            '--answer', 'install_php.version=8.3',
+        ])
+        main._preseed_answers(args)
+        self.assertTrue(args.yes)
+        self.assertEqual(console._preseed.answers, {'install_php.env': 'server', 'install_php.version': '8.3'})
+
+    def test_command_does_not_reset_top_level_options(self):
+        args = self._parse(['-y', '--answers-file', 'answers', 'uninstall', 'php'])
+        self.assertTrue(args.yes)
+        self.assertEqual(args.answers_file, 'answers')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from dotfiles import osinfo
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'os-release')
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.release_path = os.path.join(self.directory, 'os-release')
+        self.boot_id_path = os.path.join(self.directory, 'boot_id')
+        self.snapshot_path = os.path.join(self.directory, 'cache', 'osinfo.sh')
+        shutil.copyfile(FIXTURE_PATH, self.release_path)
+        self._write_boot_id('4c1f5d2e-0000-4000-8000-000000000001')
+
+        # Read the fixture instead of this machine's os-release
+        patches = (
+            mock.patch.object(osinfo, '__get_release_path', return_value=self.release_path),
+            mock.patch.object(osinfo, '_BOOT_ID_PATH', self.boot_id_path),
+            mock.patch.object(osinfo, 'ostype', return_value='linux'),
+            mock.patch('platform.freedesktop_os_release', side_effect=OSError, create=True),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        osinfo.clear_cache()
+        self.addCleanup(osinfo.clear_cache)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _write_boot_id(self, boot_id):
+        with open(self.boot_id_path, 'w', encoding='utf-8') as file:
+            file.write(boot_id + '\n')
+
+    def test_reads_the_release_file(self):
+        self.assertEqual(osinfo.id(), 'ubuntu')
+        self.assertEqual(osinfo.id_like(), ('debian',))
+        self.assertEqual(osinfo.codename(), 'noble')
+        self.assertEqual(osinfo.version(), '24.04')
+        self.assertEqual(osinfo.pretty_name(), 'Ubuntu 24.04.1 LTS')
+
+    def test_round_trip(self):
+        osinfo.write_snapshot(self.snapshot_path, 'server')
+        snapshot = osinfo._read_snapshot(self.snapshot_path)
+
+        self.assertIsNotNone(snapshot)
+        for key, value in osinfo.facts().items():
+            self.assertEqual(snapshot[f"OSINFO_{key.upper()}"], value)
+        self.assertEqual(snapshot['OSINFO_ENV'], 'server')
+
+    def test_is_sourceable(self):
+        osinfo.write_snapshot(self.snapshot_path, 'server')
+        output = subprocess.run(
+            ['sh', '-c', '. "$1" && printf "%s|%s" "$OSINFO_PRETTY_NAME" "$OSINFO_ENV"', 'sh', self.snapshot_path],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        self.assertEqual(output, 'Ubuntu 24.04.1 LTS|server')
+
+    def test_stale_after_a_reboot(self):
+        osinfo.write_snapshot(self.snapshot_path, 'server')
+        self._write_boot_id('4c1f5d2e-0000-4000-8000-000000000002')
+        self.assertIsNone(osinfo._read_snapshot(self.snapshot_path))
+
+    def test_stale_after_an_upgrade(self):
+        osinfo.write_snapshot(self.snapshot_path, 'server')
+        stat = os.stat(self.release_path)
+        os.utime(self.release_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        self.assertIsNone(osinfo._read_snapshot(self.snapshot_path))
+
+    def test_missing_snapshot(self):
+        self.assertIsNone(osinfo._read_snapshot(self.snapshot_path))
+
+
+class EnvironmentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.snapshot_path = os.path.join(self.directory, 'osinfo.sh')
+        self.boot_id_path = os.path.join(self.directory, 'boot_id')
+        with open(self.boot_id_path, 'w', encoding='utf-8') as file:
+            file.write('4c1f5d2e-0000-4000-8000-000000000001\n')
+
+        patches = (
+            mock.patch.object(osinfo, 'snapshot_path', return_value=self.snapshot_path),
+            mock.patch.object(osinfo, '_BOOT_ID_PATH', self.boot_id_path),
+            mock.patch.object(osinfo, 'ostype', return_value='linux'),
+            mock.patch.object(osinfo, '_probe_sessions', return_value=False),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        osinfo.clear_cache()
+        self.addCleanup(osinfo.clear_cache)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _detect(self, systemctl, timeout=1.0):
+        with mock.patch.object(osinfo, '_probe_systemctl', side_effect=systemctl):
+            return osinfo._detect_environment(timeout)
+
+    def _environment(self, systemctl):
+        osinfo.clear_cache()
+        with mock.patch.object(osinfo, '_probe_systemctl', side_effect=systemctl):
+            return osinfo.environment()
+
+    def test_graphical_target_is_a_desktop(self):
+        self.assertEqual(self._detect(lambda timeout: True), ('linux', True))
+
+    def test_no_positive_probe_is_a_server(self):
+        self.assertEqual(self._detect(lambda timeout: False), ('server', True))
+
+    def test_timed_out_probe_is_uncertain(self):
+        self.assertEqual(self._detect(lambda timeout: None), ('server', False))
+
+    def test_unanswered_probe_is_uncertain(self):
+        self.assertEqual(self._detect(lambda timeout: time.sleep(0.5), timeout=0.1), ('server', False))
+
+    def test_certain_answer_is_kept(self):
+        self.assertEqual(self._environment(lambda timeout: False), 'server')
+        self.assertEqual(self._environment(lambda timeout: True), 'server')
+
+    def test_uncertain_answer_is_probed_again(self):
+        self.assertEqual(self._environment(lambda timeout: None), 'server')
+        self.assertEqual(osinfo._read_snapshot(self.snapshot_path)['OSINFO_ENV_CERTAIN'], '0')
+        self.assertEqual(self._environment(lambda timeout: True), 'linux')
+        self.assertEqual(osinfo._read_snapshot(self.snapshot_path)['OSINFO_ENV_CERTAIN'], '1')
+
+
+if __name__ == '__main__':
+    unittest.main()
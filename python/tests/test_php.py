@@ -0,0 +1,181 @@
+import contextlib
+import hashlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import unittest
+from argparse import Namespace
+from unittest import mock
+
+from dotfiles import console, dpkg, php
+from dotfiles.errors import ValidationError
+
+DPKG_STATUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures', 'dpkg-status')
+_INSTALLER = b"<?php\n// composer installer\necho 'installed';\n" * 4096
+
+
+class ComposerInstallerCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_directory = os.path.join(self.directory, 'cache', 'dotfiles', 'composer')
+        self.signature_path = os.path.join(self.directory, 'installer.sig')
+        self.installer_path = os.path.join(self.directory, 'installer')
+        self._publish(_INSTALLER)
+
+        patch = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.directory, 'cache')})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _publish(self, installer, signature=None):
+        """Publish an installer and its signature (the installer's sha384 by default)"""
+        with open(self.installer_path, 'wb') as file:
+            file.write(installer)
+        with open(self.signature_path, 'w', encoding='utf-8') as file:
+            file.write((signature or hashlib.sha384(installer).hexdigest()) + '\n')
+
+    def _get_installer(self, installer_path=None, cancel=None):
+        return php._get_composer_installer(
+            pathlib.Path(self.signature_path).as_uri(),
+            pathlib.Path(installer_path or self.installer_path).as_uri(),
+            cancel,
+        )
+
+    def _cached_files(self):
+        try:
+            return sorted(os.listdir(self.cache_directory))
+        except FileNotFoundError:
+            return []
+
+    def test_miss_downloads_and_caches_by_signature(self):
+        path = self._get_installer()
+
+        signature = hashlib.sha384(_INSTALLER).hexdigest()
+        self.assertEqual(path, os.path.join(self.cache_directory, f"installer-{signature}.php"))
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), _INSTALLER)
+        self.assertEqual(self._cached_files(), [f"installer-{signature}.php"])
+
+    def test_hit_only_fetches_the_signature(self):
+        path = self._get_installer()
+        missing_installer = os.path.join(self.directory, 'missing')
+        self.assertEqual(self._get_installer(missing_installer), path)
+
+    def test_new_signature_is_a_miss(self):
+        self._get_installer()
+        self._publish(_INSTALLER + b"// 2.8\n")
+
+        path = self._get_installer()
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), _INSTALLER + b"// 2.8\n")
+        self.assertEqual(len(self._cached_files()), 2)
+
+    def test_corrupted_cache_is_downloaded_again(self):
+        path = self._get_installer()
+        with open(path, 'ab') as file:
+            file.write(b'tampered')
+
+        self.assertEqual(self._get_installer(), path)
+        with open(path, 'rb') as file:
+            self.assertEqual(file.read(), _INSTALLER)
+
+    def test_signature_mismatch_is_not_cached(self):
+        self._publish(_INSTALLER, signature='0' * 96)
+        self.assertIsNone(self._get_installer())
+        self.assertEqual(self._cached_files(), [])
+
+    def test_invalid_signature(self):
+        self._publish(_INSTALLER, signature='not a signature')
+        with self.assertRaises(ValidationError):
+            self._get_installer()
+
+    def test_cancelled_download_is_not_cached(self):
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(InterruptedError):
+            self._get_installer(cancel=cancel)
+        self.assertEqual(self._cached_files(), [])
+
+
+class PrefetchTest(unittest.TestCase):
+
+    _PLAN = {'update': False, 'add_sources': False, 'install': ['php8.3-cli']}
+
+    def test_packages_are_not_prefetched_without_sudo(self):
+        with mock.patch.object(php.run, 'validate_sudo', return_value=False), \
+                mock.patch.object(php.run, 'background') as background, \
+                mock.patch('builtins.print') as print_:
+            prefetch = php._Prefetch(dict(self._PLAN), composer=False)
+            self.assertFalse(prefetch.finish())
+        background.assert_not_called()
+        self.assertIn("sudo isn't available", print_.call_args[0][0])
+
+    def test_packages_are_prefetched_once_sudo_is_validated(self):
+        with mock.patch.object(php.run, 'validate_sudo', return_value=True), \
+                mock.patch.object(php.run, 'background') as background:
+            background.return_value.wait.return_value = 0
+            prefetch = php._Prefetch(dict(self._PLAN), composer=False)
+            self.assertFalse(prefetch.finish())
+        background.assert_called_once()
+        self.assertEqual(background.call_args[0][0][-1], 'php8.3-cli')
+        self.assertTrue(background.call_args[1]['root'])
+
+    def test_composer_http_errors_are_ignored(self):
+        error = php.HTTPException('connection dropped')
+        with mock.patch.object(php, '_get_composer_installer', side_effect=error):
+            prefetch = php._Prefetch({'update': False, 'add_sources': False, 'install': []}, composer=True)
+            prefetch.finish()
+
+
+class InstalledPackagesTest(unittest.TestCase):
+
+    def setUp(self):
+        patch = mock.patch.object(php.dpkg, 'load', return_value=dpkg.load(DPKG_STATUS_PATH))
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_version_does_not_match_a_longer_version(self):
+        self.assertEqual(php._get_installed_php_packages('8.1'), ['php8.1', 'php8.1-cli'])
+        self.assertEqual(php._get_installed_php_packages('8.10'), ['php8.10-cli'])
+
+    def test_config_files_count_as_installed(self):
+        self.assertEqual(php._get_installed_php_packages('8.3'), ['php8.3-common'])
+
+    def test_uninstallable_versions(self):
+        self.assertEqual(sorted(php._get_uninstallable_versions()), ['8.1', '8.10', '8.3'])
+
+
+class PlanTest(unittest.TestCase):
+
+    def tearDown(self):
+        console.preseed()
+
+    def _print_plan(self, **kwargs):
+        args = Namespace(**{'version': ['8.3'], 'env': None, 'format': 'json', 'update_ttl': 3600.0, **kwargs})
+        output = io.StringIO()
+        with mock.patch.object(php.dpkg, 'load', return_value=dpkg.load(DPKG_STATUS_PATH)), \
+                contextlib.redirect_stdout(output):
+            php._print_plan(args, sources_installed=False)
+        return json.loads(output.getvalue())
+
+    def test_desktop_by_default(self):
+        self.assertEqual(self._print_plan()['env'], 'desktop')
+
+    def test_preseeded_env(self):
+        console.preseed({'install_php.env': 'server'})
+        self.assertEqual(self._print_plan()['env'], 'server')
+
+    def test_given_env_wins(self):
+        console.preseed({'install_php.env': 'server'})
+        self.assertEqual(self._print_plan(env='desktop')['env'], 'desktop')
+
+
+if __name__ == '__main__':
+    unittest.main()
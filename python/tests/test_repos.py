@@ -0,0 +1,95 @@
+import os
+import shutil
+import tempfile
+import unittest
+from argparse import Namespace
+from unittest import mock
+
+from dotfiles import repos
+
+
+class ReposTestCase(unittest.TestCase):
+    """Repos of a temporary repos directory, with the cache and data directories kept alongside"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.repos_path = os.path.join(self.directory, 'repos')
+        self.aliases_path = os.path.join(self.directory, 'aliases')
+        for name in ('api', 'docs', 'dotfiles'):
+            self.make_repo(name)
+
+        patch = mock.patch.dict(os.environ, {
+            'XDG_CACHE_HOME': os.path.join(self.directory, 'cache'),
+            'XDG_DATA_HOME': os.path.join(self.directory, 'data'),
+        })
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_repo(self, name):
+        """Make a git repo in the repos directory, returns its path"""
+        path = os.path.join(self.repos_path, name)
+        os.makedirs(os.path.join(path, '.git'))
+        return path
+
+    def args(self, **kwargs):
+        return Namespace(**{
+            'repos_path': self.repos_path,
+            'file_path': self.aliases_path,
+            'max_depth': 1,
+            'rebuild_index': False,
+            'key': None,
+            **kwargs,
+        })
+
+
+class LookupKeyTest(ReposTestCase):
+
+    def test_exact_key(self):
+        self.assertEqual(repos._lookup_key(self.args(key='docs')), ('docs', os.path.join(self.repos_path, 'docs')))
+
+    def test_unique_prefix(self):
+        self.assertEqual(repos._lookup_key(self.args(key='a'))[0], 'api')
+
+    def test_shared_prefix_jumps_to_the_most_used_key(self):
+        self.assertEqual(repos._lookup_key(self.args(key='do'))[0], 'docs')
+
+        repos._record_usage('dotfiles')
+        self.assertEqual(repos._lookup_key(self.args(key='do'))[0], 'dotfiles')
+
+    def test_fuzzy_match_is_not_jumped_to(self):
+        with self.assertRaises(SystemExit):
+            repos._lookup_key(self.args(key='dtf'))
+
+    def test_unknown_key(self):
+        with self.assertRaises(SystemExit):
+            repos._lookup_key(self.args(key='web'))
+
+
+class IndexTest(ReposTestCase):
+
+    def _load(self, max_depth=1):
+        return repos._load_repo_aliases(self.repos_path, self.aliases_path, max_depth=max_depth)
+
+    def test_new_repo_invalidates_the_index(self):
+        self.assertEqual(list(self._load()), ['api', 'docs', 'dotfiles'])
+        self.make_repo('web')
+        self.assertEqual(list(self._load()), ['api', 'docs', 'dotfiles', 'web'])
+
+    def test_git_init_at_the_max_depth_invalidates_the_index(self):
+        os.makedirs(os.path.join(self.repos_path, 'org', 'tool'))
+        self.assertNotIn('org/tool', self._load(max_depth=2))
+
+        os.makedirs(os.path.join(self.repos_path, 'org', 'tool', '.git'))
+        self.assertEqual(self._load(max_depth=2)['org/tool'], os.path.join(self.repos_path, 'org', 'tool'))
+
+    def test_index_of_another_max_depth_is_not_used(self):
+        os.makedirs(os.path.join(self.repos_path, 'org', 'tool', '.git'))
+        self.assertIn('org', self._load())
+        self.assertIn('org/tool', self._load(max_depth=2))
+
+
+if __name__ == '__main__':
+    unittest.main()
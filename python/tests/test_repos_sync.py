@@ -0,0 +1,147 @@
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+from argparse import Namespace
+from unittest import mock
+
+from dotfiles import console, repos_sync
+
+
+def _git(cwd, *args):
+    """Run git in a directory, returns its output"""
+    return subprocess.run(
+        ['git', '-c', 'user.name=Test', '-c', 'user.email=test@example.com', '-c', 'init.defaultBranch=main', *args],
+        cwd=cwd,
+        stdin=subprocess.DEVNULL,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.strip()
+
+
+class SyncTest(unittest.TestCase):
+    """Repos cloned from local bare remotes"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.repos_path = os.path.join(self.directory, 'repos')
+        self.remote_path = os.path.join(self.directory, 'remote.git')
+        self.seed_path = os.path.join(self.directory, 'seed')
+
+        _git(self.directory, 'init', '--bare', self.remote_path)
+        _git(self.directory, 'clone', self.remote_path, self.seed_path)
+        self._commit('first')
+        _git(self.seed_path, 'push', 'origin', 'main')
+
+        for name in ('tracking', 'feature', 'detached'):
+            _git(self.directory, 'clone', self.remote_path, os.path.join(self.repos_path, name))
+        _git(os.path.join(self.repos_path, 'feature'), 'checkout', '-b', 'feature')
+        _git(os.path.join(self.repos_path, 'detached'), 'checkout', '--detach')
+
+        self._commit('second')
+        _git(self.seed_path, 'push', 'origin', 'main')
+        self.head = _git(self.seed_path, 'rev-parse', 'HEAD')
+
+        patch = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.directory, 'cache')})
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _commit(self, message):
+        _git(self.seed_path, 'commit', '--allow-empty', '-m', message)
+
+    def _sync(self, **kwargs):
+        """Run `repos-sync`, returns its exit code and output"""
+        args = Namespace(**{
+            'repos_path': self.repos_path,
+            'file_path': os.path.join(self.directory, 'aliases'),
+            'max_depth': 1,
+            'rebuild_index': False,
+            'ff': True,
+            'jobs': 4,
+            'per_remote': 2,
+            'retries': 0,
+            'timeout': 30.0,
+            **kwargs,
+        })
+        output = io.StringIO()
+        code = console.SUCCESS
+        with contextlib.redirect_stdout(output):
+            try:
+                repos_sync.cmd_repos_sync(args)
+            except SystemExit as ex:
+                code = ex.code
+        return code, output.getvalue()
+
+    def _head(self, name):
+        return _git(os.path.join(self.repos_path, name), 'rev-parse', 'HEAD')
+
+    def test_fetches_and_fast_forwards(self):
+        code, output = self._sync()
+        self.assertEqual(code, console.SUCCESS, output)
+        self.assertEqual(self._head('tracking'), self.head)
+        self.assertEqual(_git(os.path.join(self.repos_path, 'feature'), 'rev-parse', 'origin/main'), self.head)
+        self.assertIn('Synced 3/3 repos', output)
+
+    def test_no_upstream_and_detached_head_are_skipped(self):
+        code, output = self._sync()
+        self.assertEqual(code, console.SUCCESS, output)
+        self.assertNotEqual(self._head('feature'), self.head)
+        self.assertNotEqual(self._head('detached'), self.head)
+        self.assertIn('no upstream for feature', output)
+        self.assertIn('detached HEAD', output)
+        self.assertIn('Not fast-forwarded: detached, feature', output)
+
+    def test_failed_fetch_fails_the_command(self):
+        shutil.rmtree(self.remote_path)
+        code, output = self._sync(ff=False)
+        self.assertEqual(code, console.FAILURE)
+        self.assertIn('Failed (3)', output)
+
+    def test_remote_host(self):
+        self.assertEqual(repos_sync._get_repo_host(os.path.join(self.repos_path, 'tracking')), 'local')
+        self.assertEqual(repos_sync._get_remote_host('git@github.com:user/repo.git'), 'github.com')
+        self.assertEqual(repos_sync._get_remote_host('https://user@gitlab.com/user/repo'), 'gitlab.com')
+
+
+class ScheduleTest(unittest.TestCase):
+
+    def test_busy_host_doesnt_hold_up_the_others(self):
+        hosts = {f"a{index}": 'a.example' for index in range(4)}
+        hosts['b0'] = 'b.example'
+        lock = threading.Lock()
+        running = {'a.example': 0, 'b.example': 0}
+        most = dict(running)
+        finished = []
+
+        def sync_repo(key, path, host, args):
+            with lock:
+                running[host] += 1
+                most[host] = max(most[host], running[host])
+            time.sleep(0.1)
+            with lock:
+                running[host] -= 1
+                finished.append(key)
+            return {'key': key}
+
+        args = Namespace(jobs=2, per_remote=1)
+        with mock.patch.object(repos_sync, '_get_repo_host', side_effect=lambda path: hosts[path]), \
+                mock.patch.object(repos_sync, '_sync_repo', side_effect=sync_repo):
+            results = list(repos_sync._sync_repos({key: key for key in hosts}, args))
+
+        self.assertEqual(len(results), 5)
+        self.assertEqual(most, {'a.example': 1, 'b.example': 1})
+        # b0 runs alongside the first of a's repos instead of waiting behind all of them
+        self.assertLess(finished.index('b0'), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+import shutil
+import subprocess
+import sys
+import time
+import unittest
+
+from dotfiles import run
+
+
+class StreamingProcessTest(unittest.TestCase):
+
+    def test_lines(self):
+        process = run.script(sys.executable, '-c', 'print("a"); print("b")', stream=True, capture_output=True)
+        self.assertEqual(list(process), ['a\n', 'b\n'])
+        self.assertEqual(process.returncode, 0)
+        self.assertEqual(process.stdout, 'a\nb\n')
+
+    def test_bytes(self):
+        process = run.script(sys.executable, '-c', 'print("a")', stream='bytes')
+        self.assertEqual(b''.join(process), b'a\n')
+
+    def test_finished_command_is_not_killed(self):
+        for _ in range(50):
+            process = run.script(shutil.which('echo'), 'hi', stream=True)
+            self.assertEqual(list(process), ['hi\n'])
+            self.assertEqual(process.returncode, 0)
+
+    def test_command_that_closes_stdout_early_is_waited_for(self):
+        process = run.script(shutil.which('sh'), '-c', 'exec >&-; sleep 0.2', stream=True)
+        self.assertEqual(list(process), [])
+        self.assertEqual(process.returncode, 0)
+
+    def test_failure_raises(self):
+        process = run.script(sys.executable, '-c', 'exit(2)', stream=True)
+        with self.assertRaises(subprocess.CalledProcessError):
+            list(process)
+
+    def test_stopping_early_kills_the_command(self):
+        process = run.script(shutil.which('yes'), stream=True, check=False)
+        lines = iter(process)
+        self.assertEqual(next(lines), 'y\n')
+        lines.close()
+        self.assertLess(process.returncode, 0)
+
+    def test_timeout_counts_from_the_start(self):
+        process = run.script(sys.executable, '-c', 'import time; time.sleep(5)', stream=True, timeout=0.2)
+        time.sleep(0.4)
+        start = time.perf_counter()
+        with self.assertRaises(subprocess.TimeoutExpired):
+            list(process)
+        self.assertLess(time.perf_counter() - start, 1.0)
+
+
+class GatherTest(unittest.TestCase):
+
+    def test_captures_each_command(self):
+        processes = run.gather(
+            {'out': [sys.executable, '-c', 'print("hi")'], 'fail': [sys.executable, '-c', 'exit(3)']},
+            capture_output=True,
+        )
+        self.assertEqual(list(processes), ['out', 'fail'])
+        self.assertEqual(processes['out'].stdout, b'hi\n')
+        self.assertEqual(processes['fail'].returncode, 3)
+
+    def test_missing_command_doesnt_stop_the_others(self):
+        processes = run.gather(
+            {'slow': [sys.executable, '-c', 'import time; time.sleep(0.2); print("done")'],
+             'missing': ['nonexistent-cmd-xyz']},
+            capture_output=True,
+        )
+        self.assertEqual(processes['slow'].returncode, 0)
+        self.assertEqual(processes['slow'].stdout, b'done\n')
+        self.assertEqual(processes['missing'].returncode, 127)
+        self.assertIn(b'nonexistent-cmd-xyz', processes['missing'].stderr)
+
+    def test_timeout(self):
+        processes = run.gather(
+            {'sleep': [sys.executable, '-c', 'import time; time.sleep(5)']},
+            capture_output=True,
+            timeout=0.2,
+        )
+        self.assertNotEqual(processes['sleep'].returncode, 0)
+        self.assertIn(b'timed out', processes['sleep'].stderr)
+
+    def test_on_done_is_called_as_each_command_finishes(self):
+        done = []
+        processes = run.gather(
+            {'slow': [sys.executable, '-c', 'import time; time.sleep(0.3)'], 'fast': [sys.executable, '-c', '']},
+            jobs=2,
+            capture_output=True,
+            on_done=lambda name, process: done.append((name, process.returncode)),
+        )
+        self.assertEqual(list(processes), ['slow', 'fast'])
+        self.assertEqual(done, [('fast', 0), ('slow', 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from dotfiles import frecency, repos, serve
+from dotfiles.main import _build_parser
+
+
+class ServeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, 'dotfiles.sock')
+        self.repos_path = os.path.join(self.directory, 'repos')
+        for name in ('api', 'dotfiles'):
+            os.makedirs(os.path.join(self.repos_path, name, '.git'))
+        self.alias_args = ['--repos-path', self.repos_path, '--file-path', os.path.join(self.directory, 'aliases')]
+
+        patches = (
+            mock.patch.dict(os.environ, {
+                'XDG_CACHE_HOME': os.path.join(self.directory, 'cache'),
+                'XDG_DATA_HOME': os.path.join(self.directory, 'data'),
+            }),
+            mock.patch.object(serve._RequestHandler, 'timeout', 0.2),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        old_umask = os.umask(0o077)
+        try:
+            self.server = serve._Server(self.socket_path, _build_parser())
+        finally:
+            os.umask(old_umask)
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def _query(self, *argv):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(self.socket_path)
+            sock.sendall(('\t'.join(argv) + '\n').encode('utf-8'))
+            sock.shutdown(socket.SHUT_WR)
+            chunks = []
+            for chunk in iter(lambda: sock.recv(4096), b''):
+                chunks.append(chunk)
+        return b''.join(chunks).decode('utf-8')
+
+    def test_socket_is_trusted(self):
+        self.assertTrue(serve._is_trusted_socket(self.socket_path))
+
+    def test_status_line_and_output(self):
+        self.assertEqual(self._query('repos', '--list-keys', *self.alias_args), '0\napi\ndotfiles\n')
+
+    def test_failure_status(self):
+        self.assertEqual(self._query('repos', 'web', *self.alias_args), '1\n')
+
+    def test_repos_key_records_the_use(self):
+        response = self._query('repos', 'dot', *self.alias_args)
+        self.assertEqual(response, f"0\n{os.path.join(self.repos_path, 'dotfiles')}\n")
+        self.assertGreater(frecency.frecency(frecency.load(repos._get_usage_path()), 'dotfiles'), 0)
+
+    def test_writing_requests_are_not_served(self):
+        for argv in (['osinfo', '--snapshot'], ['osinfo', '--env'], ['repos', '--rebuild-index', *self.alias_args],
+                     ['install', 'php'], []):
+            with self.subTest(argv=argv):
+                self.assertEqual(self._query(*argv), '')
+
+    def test_stalled_client_doesnt_block_the_others(self):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as stalled:
+            stalled.connect(self.socket_path)
+            start = time.perf_counter()
+            self.assertEqual(self._query('repos', '--list-keys', *self.alias_args), '0\napi\ndotfiles\n')
+            self.assertLess(time.perf_counter() - start, 2.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
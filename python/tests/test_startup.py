@@ -0,0 +1,79 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+PYTHON_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules only the install commands need, `repos` and the completions mustn't import them
+_HEAVY_MODULES = ('dotfiles.php', 'urllib', 'hashlib', 'tempfile')
+
+
+# Runs `python -m dotfiles` and prints the imported modules when it exits
+_SCRIPT = """
+import atexit, runpy, sys
+atexit.register(lambda: print('modules:', *sorted(sys.modules), file=sys.stderr))
+runpy.run_module('dotfiles', run_name='__main__', alter_sys=True)
+"""
+
+
+def _get_imported_modules(argv, home):
+    """Run dotfiles and get the names of the modules it imported"""
+    env = dict(
+        os.environ,
+        PYTHONPATH=PYTHON_DIR,
+        XDG_CACHE_HOME=os.path.join(home, 'cache'),
+        XDG_DATA_HOME=os.path.join(home, 'data'),
+    )
+    env.pop('DOTFILES_TRACE', None)
+    process = subprocess.run(
+        [sys.executable, '-c', _SCRIPT, *argv],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    modules = set()
+    for line in process.stderr.splitlines():
+        if line.startswith('modules:'):
+            modules.update(line.split()[1:])
+    return process, modules
+
+
+class StartupImportsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.home = tempfile.mkdtemp()
+        self.repos_path = os.path.join(self.home, 'repos')
+        os.makedirs(os.path.join(self.repos_path, 'dotfiles'))
+        self.alias_args = ['--repos-path', self.repos_path, '--file-path', os.path.join(self.home, 'aliases')]
+
+    def tearDown(self):
+        shutil.rmtree(self.home, ignore_errors=True)
+
+    def assert_not_imported(self, modules):
+        for name in _HEAVY_MODULES:
+            self.assertFalse(
+                any(module == name or module.startswith(f"{name}.") for module in modules),
+                f"{name} was imported",
+            )
+
+    def test_repos_key(self):
+        process, modules = _get_imported_modules(['repos', 'dotfiles', *self.alias_args], self.home)
+        self.assertEqual(process.returncode, 0, process.stderr)
+        self.assertEqual(process.stdout.strip(), os.path.join(self.repos_path, 'dotfiles'))
+        self.assertIn('dotfiles.repos', modules)
+        self.assert_not_imported(modules)
+
+    def test_completion(self):
+        for argv in (['--completion'], ['--completion', 'repos', *self.alias_args], ['--completion', 'install']):
+            with self.subTest(argv=argv):
+                process, modules = _get_imported_modules(argv, self.home)
+                self.assertEqual(process.returncode, 0, process.stderr)
+                self.assert_not_imported(modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
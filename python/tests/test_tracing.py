@@ -0,0 +1,72 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from dotfiles import tracing
+
+
+class TracingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.trace_path = os.path.join(self.directory, 'trace.json')
+
+        patches = (
+            mock.patch.object(tracing, '_trace', tracing._Trace()),
+            mock.patch.object(tracing.atexit, 'register'),
+            mock.patch.dict(os.environ, {'XDG_CACHE_HOME': os.path.join(self.directory, 'cache')}),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        os.environ.pop(tracing.ENV_VAR, None)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def test_off_by_default(self):
+        self.assertEqual(tracing.configure(['repos', 'dotfiles']), ['repos', 'dotfiles'])
+        self.assertFalse(tracing.enabled())
+        with tracing.span('parse') as details:
+            details['key'] = 'dotfiles'
+        self.assertIsNone(tracing._trace.events)
+
+    def test_profile_options_are_removed(self):
+        argv = ['--profile-output', self.trace_path, 'repos', '--', '--profile']
+        self.assertEqual(tracing.configure(argv), ['repos', '--', '--profile'])
+        self.assertTrue(tracing.enabled())
+        self.assertEqual(tracing._trace.output_path, self.trace_path)
+
+    def test_env_var(self):
+        with mock.patch.dict(os.environ, {tracing.ENV_VAR: '1'}):
+            tracing.configure([])
+        self.assertEqual(tracing._trace.output_path, tracing.default_path())
+
+    def test_written_trace(self):
+        tracing.enable(self.trace_path)
+        with tracing.span('git status', 'run') as details:
+            details['returncode'] = 0
+        tracing.record('build parser', 'cli', tracing.START, tracing.START + 0.5, lane=1)
+
+        output = io.StringIO()
+        with contextlib.redirect_stderr(output):
+            tracing._write()
+
+        with open(self.trace_path, 'r', encoding='utf-8') as file:
+            events = json.load(file)['traceEvents']
+        self.assertEqual([event['name'] for event in events], ['git status', 'build parser'])
+        self.assertEqual(events[0]['args'], {'returncode': 0})
+        self.assertEqual(events[1]['dur'], 500000.0)
+        # The summary lists the slowest events first
+        lines = output.getvalue().splitlines()
+        self.assertIn('build parser', lines[1])
+        self.assertIn('git status (exit 0)', lines[2])
+
+
+if __name__ == '__main__':
+    unittest.main()
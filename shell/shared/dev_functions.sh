@@ -28,6 +28,9 @@ repo()
     #
     # Usage: repo [-l] {REPO_NAME}
     #
+    # REPO_NAME can also be the start of an alias, the most frequently and
+    # recently used alias it's the start of is picked.
+    #
     # Options:
     # -l, --list  List the aliases
 
@@ -52,9 +55,21 @@ repo()
         return 0
     fi
 
-    REPO_PATH="$(dotfiles repos "${INPUT}")"
+    # Only alias keys are looked up, anything else would run inside the cd capture below
+    case "$INPUT" in
+        -*)
+            cmsg "$USAGE" 1>&2
+            return 1
+            ;;
+    esac
+
+    if command -v __dotfiles_query >/dev/null 2>&1; then
+        REPO_PATH="$(__dotfiles_query repos "${INPUT}")"
+    else
+        REPO_PATH="$(dotfiles repos "${INPUT}")"
+    fi
 
-    if [ -z "$REPO_PATH" ]; then
+    if [ -z "$REPO_PATH" ] || [ ! -d "$REPO_PATH" ]; then
         cmsg -r "Invalid alias '${INPUT}'" 1>&2
         return 1
     fi
@@ -57,6 +57,47 @@ extract()
     return "$?"
 }
 
+osinfo_snapshot()
+{
+    # Load the cached OS facts (OSINFO_ID, OSINFO_CODENAME, OSINFO_ENV, ...)
+    # written by `dotfiles osinfo --snapshot`. Sourcing it costs no process;
+    # it's only regenerated when the os-release file changed or after a reboot.
+    #
+    # Usage: osinfo_snapshot [-f]
+    #
+    # Options:
+    # -f  Regenerate the snapshot
+
+    local SNAPSHOT BOOT_ID RELEASE_FILE
+
+    SNAPSHOT="${XDG_CACHE_HOME:-"${HOME}/.cache"}/dotfiles/osinfo.sh"
+    BOOT_ID=""
+
+    if [ "${1:-""}" != "-f" ] && [ -r "$SNAPSHOT" ]; then
+        . "$SNAPSHOT"
+
+        if [ -r /proc/sys/kernel/random/boot_id ]; then
+            read -r BOOT_ID < /proc/sys/kernel/random/boot_id
+        fi
+
+        # Must match osinfo.SNAPSHOT_VERSION
+        if [ "${OSINFO_SNAPSHOT_VERSION:-""}" = "2" ] && [ "${OSINFO_BOOT_ID:-""}" = "$BOOT_ID" ]; then
+            for RELEASE_FILE in /etc/os-release /usr/lib/os-release /System/Library/CoreServices/SystemVersion.plist; do
+                if [ -e "$RELEASE_FILE" ]; then
+                    [ "$RELEASE_FILE" -nt "$SNAPSHOT" ] || return 0
+                    break
+                fi
+            done
+        fi
+    fi
+
+    if ! command -v dotfiles >/dev/null 2>&1; then
+        return 1
+    fi
+
+    dotfiles osinfo --snapshot "$SNAPSHOT" >/dev/null && . "$SNAPSHOT"
+}
+
 tarthis()
 {
     # Creates an archive (*.tar.gz) from given directory